@@ -30,19 +30,23 @@ class CLIRunner:
 
     def print_banner(self):
         """Вывод приветственного баннера"""
-        print("=" * 60)
-        print("  PsychoTeleBot - CLI Debug Mode")
-        print("=" * 60)
-        print("\nДоступные команды:")
-        print("  /start - начать диалог")
-        print("  /menu - вернуться в меню")
-        print("  /clear - очистить контекст ИИ")
-        print("  /reset - сбросить сессию")
-        print("  /user <id> - сменить пользователя")
-        print("  /tickets - показать все заявки")
-        print("  /quit - выход")
-        print("=" * 60)
-        print()
+        lines = [
+            "=" * 60,
+            "  PsychoTeleBot - CLI Debug Mode",
+            "=" * 60,
+            "",
+            "Доступные команды:",
+            "  /start - начать диалог",
+            "  /menu - вернуться в меню",
+            "  /clear - очистить контекст ИИ",
+            "  /reset - сбросить сессию",
+            "  /user <id> - сменить пользователя",
+            "  /tickets - показать все заявки",
+            "  /quit - выход",
+            "=" * 60,
+            "",
+        ]
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def run(self):
         """Запуск CLI интерфейса"""
@@ -60,7 +64,7 @@ class CLIRunner:
                     continue
                 
                 # Обработка служебных команд CLI
-                if user_input.startswith("/quit") or user_input.lower() == "exit":
+                if user_input.startswith("/quit") or user_input.casefold() == "exit":
                     self.running = False
                     print("\n👋 До свидания!")
                     break
@@ -121,23 +125,29 @@ class CLIRunner:
             print("\n📋 Заявок нет")
             return
         
-        print("\n" + "=" * 60)
-        print("📋 Все заявки:")
-        print("=" * 60)
-        
-        for ticket in tickets:
-            print(f"\n🎫 ID: {ticket.id}")
-            print(f"   Пользователь: {ticket.user_id}")
-            print(f"   Тема: {ticket.topic}")
-            print(f"   Статус: {ticket.status.value}")
-            print(f"   Критичность: {ticket.severity.value}")
-            print(f"   Возраст: {ticket.age}, Пол: {ticket.gender}")
-            print(f"   Сообщение: {ticket.message[:50]}...")
-            print(f"   Создано: {ticket.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-            if ticket.assigned_to:
-                print(f"   Назначено: {ticket.assigned_to}")
-        
-        print("=" * 60)
+        # Собираем весь вывод в одну строку — один write() вместо
+        # десятка print() на каждую заявку
+        lines = ["", "=" * 60, "📋 Все заявки:", "=" * 60]
+
+        # Локальные привязки вместо повторных цепочек атрибутов в цикле
+        append = lines.append
+        for t in tickets:
+            status = t.status.value
+            severity = t.severity.value
+            created = t.created_at.strftime("%Y-%m-%d %H:%M:%S")
+            append(f"\n🎫 ID: {t.id}")
+            append(f"   Пользователь: {t.user_id}")
+            append(f"   Тема: {t.topic}")
+            append(f"   Статус: {status}")
+            append(f"   Критичность: {severity}")
+            append(f"   Возраст: {t.age}, Пол: {t.gender}")
+            append(f"   Сообщение: {t.message[:50]}...")
+            append(f"   Создано: {created}")
+            if t.assigned_to:
+                append(f"   Назначено: {t.assigned_to}")
+
+        lines.append("=" * 60)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
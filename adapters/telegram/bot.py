@@ -3,7 +3,7 @@ import logging
 import os
 from telegram import Update, BotCommand
 from telegram.constants import ChatAction
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, MessageHandler, filters, ContextTypes
 from application.bot_service import BotService
 from application.state_machine import StateMachine
 from infrastructure.sqlite_repositories import (
@@ -44,7 +44,7 @@ class TelegramBot:
                 user_profile.role = UserRole.ADMIN
                 role_repo.save_user(user_profile)
 
-            role_manager.users[user_profile.user_id] = user_profile
+            role_manager.add_user(user_profile)
         
         state_machine = StateMachine()
         self.bot_service = BotService(
@@ -60,6 +60,7 @@ class TelegramBot:
         
         # Регистрируем команды для меню Telegram
         self.application.post_init = self._post_init
+        self.application.post_shutdown = self._post_shutdown
 
     async def _post_init(self, application: Application):
         """Устанавливаем команды бота после инициализации"""
@@ -72,14 +73,45 @@ class TelegramBot:
         await application.bot.set_my_commands(commands)
         logger.info("Команды бота установлены")
 
+        # Сессии пишутся в SQLite фоновой задачей, а не в обработчике апдейта
+        self.bot_service.start_background_flush()
+
+    async def _post_shutdown(self, application: Application):
+        """Дописываем несброшенные сессии перед остановкой"""
+        await self.bot_service.stop_background_flush()
+
+    # Команды, которые уходят в BotService как обычный текст
+    _BOT_COMMANDS = frozenset({"/start", "/menu", "/clear", "/end"})
+
     def _register_handlers(self):
-        self.application.add_handler(CommandHandler("start", self.handle_start))
-        self.application.add_handler(CommandHandler("menu", self.handle_menu))
-        self.application.add_handler(CommandHandler("clear", self.handle_clear))
-        self.application.add_handler(CommandHandler("help", self.handle_help))
-        self.application.add_handler(CommandHandler("end", self.handle_end))
+        # Один обработчик команд с выбором по словарю вместо цепочки
+        # CommandHandler'ов, которую PTB перебирает на каждом апдейте
+        self.application.add_handler(MessageHandler(filters.COMMAND, self._cmd_dispatch))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
 
+    async def _cmd_dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Единая точка обработки всех команд"""
+        command = update.message.text.split()[0].split("@")[0]
+
+        if command == "/help":
+            await self.handle_help(update, context)
+            return
+
+        if command not in self._BOT_COMMANDS:
+            # Неизвестные команды игнорируем (как и раньше без обработчика)
+            return
+
+        user = update.effective_user
+        user_id = str(user.id)
+        response = self.bot_service.process_message(
+            user_id, command, user.username, user.first_name, user.last_name
+        )
+        await update.message.reply_text(response, parse_mode="Markdown")
+        await self._send_pending_notifications(context)
+
+        if command == "/start":
+            logger.info(f"User {user_id} ({user.username}) started the bot")
+
     async def _send_pending_notifications(self, context: ContextTypes.DEFAULT_TYPE):
         """Отправить накопленные уведомления другим пользователям"""
         notifications = self.bot_service.get_pending_notifications()
@@ -93,37 +125,6 @@ class TelegramBot:
             except Exception as e:
                 logger.error(f"Failed to send notification to {target_user_id}: {e}")
 
-    async def handle_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = str(update.effective_user.id)
-        username = update.effective_user.username
-        first_name = update.effective_user.first_name
-        last_name = update.effective_user.last_name
-        
-        response = self.bot_service.process_message(
-            user_id, "/start", username, first_name, last_name
-        )
-        await update.message.reply_text(response, parse_mode="Markdown")
-        await self._send_pending_notifications(context)
-        logger.info(f"User {user_id} ({username}) started the bot")
-
-    async def handle_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = str(update.effective_user.id)
-        response = self.bot_service.process_message(user_id, "/menu")
-        await update.message.reply_text(response, parse_mode="Markdown")
-        await self._send_pending_notifications(context)
-
-    async def handle_clear(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = str(update.effective_user.id)
-        response = self.bot_service.process_message(user_id, "/clear")
-        await update.message.reply_text(response, parse_mode="Markdown")
-        await self._send_pending_notifications(context)
-
-    async def handle_end(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = str(update.effective_user.id)
-        response = self.bot_service.process_message(user_id, "/end")
-        await update.message.reply_text(response, parse_mode="Markdown")
-        await self._send_pending_notifications(context)
-
     async def handle_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         help_text = """🤖 *PsychoTeleBot - Помощь*
 
@@ -3,12 +3,19 @@ import os
 from dotenv import load_dotenv
 from adapters.telegram.bot import TelegramBot
 
+try:
+    import uvloop  # event loop на libuv: быстрее на socket I/O (только Linux/macOS)
+except ImportError:
+    uvloop = None
+
 def main():
     load_dotenv()
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         print("❌ TELEGRAM_BOT_TOKEN не найден в .env")
         return
+    if uvloop is not None:
+        uvloop.install()
     bot = TelegramBot(token)
     bot.run()
 
@@ -1,23 +1,60 @@
 """
 AI Service для интеграции с OpenRouter API
 """
+import asyncio
+import atexit
+import hashlib
 import os
 import json
 import logging
+import queue
+import re
 import threading
 import time
 import random
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from collections import deque
 import httpx
 from datetime import datetime
 
+try:
+    import orjson  # C-реализация JSON: заметно быстрее на кириллице
+except ImportError:
+    orjson = None
+
+try:
+    import cachetools  # Ограниченные по размеру кэши для долгого аптайма
+except ImportError:
+    cachetools = None
+
+try:
+    import h2  # noqa: F401 — наличие h2 включает HTTP/2-мультиплексирование
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+
+def _json_dumps(obj: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _json_loads(text: str) -> dict:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
 MEMORY_LAST_MESSAGES_LIMIT = int(os.getenv("MEMORY_LAST_MESSAGES", "8"))
 SUMMARY_UPDATE_EVERY = int(os.getenv("MEMORY_SUMMARY_EVERY", "12"))
 MEMORY_STORE_PATH = os.getenv("MEMORY_STORE_PATH")
+MEMORY_LOG_COMPACT_BYTES = int(os.getenv("MEMORY_LOG_COMPACT_BYTES", str(1024 * 1024)))
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "100000"))
+RATE_STATE_TTL_SECONDS = int(os.getenv("RATE_STATE_TTL_SECONDS", "3600"))
 
 RATE_LIMIT_MESSAGE = "Подожди пару секунд, я ещё отвечаю 🙂"
 MIN_INTERVAL_SECONDS = float(os.getenv("RATE_MIN_INTERVAL_SECONDS", "4"))
@@ -25,30 +62,111 @@ MAX_PER_MINUTE = int(os.getenv("RATE_MAX_PER_MINUTE", "12"))
 MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1200"))
 MAX_RESPONSE_LENGTH = int(os.getenv("MAX_RESPONSE_LENGTH", "1200"))
 RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_STREAMING = os.getenv("AI_STREAMING", "false").lower() in ("1", "true", "yes")
+AI_RESPONSE_CACHE_TTL = int(os.getenv("AI_RESPONSE_CACHE_TTL", "300"))
+# Помечать ли системный промпт cache_control-блоком: провайдеры с кэшем
+# промпта (Anthropic и совместимые через OpenRouter) переиспользуют KV-префикс
+AI_PROMPT_CACHE = os.getenv("AI_PROMPT_CACHE", "true").lower() in ("1", "true", "yes")
+# Порог (в символах), после которого старая часть истории сворачивается
+# в одну системную сводку перед отправкой в API
+HISTORY_COMPACT_CHAR_LIMIT = int(os.getenv("AI_HISTORY_COMPACT_CHARS", "4000"))
+# Последние N сообщений истории никогда не сжимаются
+HISTORY_KEEP_VERBATIM = 6
 if "PYTEST_CURRENT_TEST" in os.environ:
     RATE_LIMIT_ENABLED = False
+    AI_RESPONSE_CACHE_TTL = 0
 
 
 @dataclass
 class UserMemory:
     summary: str = ""
-    last_messages: List[Dict[str, str]] = field(default_factory=list)
+    # deque с maxlen сам выталкивает старые сообщения без переслайсивания
+    last_messages: deque = field(
+        default_factory=lambda: deque(maxlen=MEMORY_LAST_MESSAGES_LIMIT)
+    )
     message_count: int = 0
 
 
 @dataclass
 class RateState:
     last_request_at: float = 0.0
-    window: deque = field(default_factory=deque)
-    last_message: str = ""
+    # Кольцевой буфер таймстемпов: слот idx % N хранит время запроса N назад
+    window: array = field(default_factory=lambda: array("d", [0.0] * MAX_PER_MINUTE))
+    window_idx: int = 0
+    # Повтор сообщения детектируем по (hash, len), не храня сам текст
+    last_message_hash: int = 0
+    last_message_len: int = -1
     last_response: str = ""
 
 
-_MEMORY_STORE: Dict[str, UserMemory] = {}
+if cachetools is not None:
+    class _MemoryLRU(cachetools.LRUCache):
+        """LRU-кэш памяти пользователей: вытесненное дописывается в лог"""
+
+        def popitem(self):
+            user_id, memory = super().popitem()
+            _append_memory_record(user_id, memory)
+            return user_id, memory
+
+    _MEMORY_STORE: Dict[str, UserMemory] = _MemoryLRU(maxsize=MEMORY_CACHE_SIZE)
+    _RATE_STATE: Dict[str, RateState] = cachetools.TTLCache(
+        maxsize=100000, ttl=RATE_STATE_TTL_SECONDS
+    )
+else:
+    # Без cachetools — обычные dict (неограниченные, как раньше)
+    _MEMORY_STORE = {}
+    _RATE_STATE = {}
+
 _MEMORY_LOADED = False
-_RATE_STATE: Dict[str, RateState] = {}
 
-SMALL_TALK = {
+# Кэш готовых ответов для полностью идентичных запросов (точное совпадение
+# модели, параметров и сообщений) — повторный вопрос не ходит в OpenRouter
+if cachetools is not None and AI_RESPONSE_CACHE_TTL > 0:
+    _RESPONSE_CACHE = cachetools.TTLCache(maxsize=1024, ttl=AI_RESPONSE_CACHE_TTL)
+else:
+    _RESPONSE_CACHE = None
+
+# Single-flight: одинаковые запросы, находящиеся в полёте одновременно,
+# коалесцируются в один HTTP-вызов (ключ тот же, что у кэша ответов)
+_INFLIGHT: Dict[tuple, tuple] = {}
+
+# Фоновые задачи обновления резюме: ссылки держим, чтобы их не собрал GC,
+# блокировки защищают от параллельных обновлений одного пользователя
+_SUMMARY_TASKS: set = set()
+_SUMMARY_LOCKS: Dict[str, asyncio.Lock] = {}
+
+# Единый фоновый event loop для синхронных вызовов из-под работающего loop.
+# Создаётся лениво один раз — поток на каждый запрос не поднимаем.
+_BG_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_BG_LOOP_LOCK = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Получить (или лениво создать) фоновый event loop в daemon-потоке"""
+    global _BG_LOOP
+    if _BG_LOOP is None:
+        with _BG_LOOP_LOCK:
+            if _BG_LOOP is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="ai-service-loop", daemon=True
+                )
+                thread.start()
+                _BG_LOOP = loop
+    return _BG_LOOP
+
+# Таблица для удаления пунктуации одним проходом вместо серии str.replace
+_PUNCT_TABLE = str.maketrans("", "", "!.,?…:;")
+
+
+def _normalize_message(text: str) -> str:
+    # casefold, а не lower: корректнее для кириллицы и спецсимволов Unicode
+    return text.strip().translate(_PUNCT_TABLE).casefold()
+
+
+# Записи прогоняются через _normalize_message, чтобы совпадать с
+# нормализованным входом один в один
+SMALL_TALK = frozenset(_normalize_message(x) for x in (
     "привет",
     "приветик",
     "привет!",
@@ -113,7 +231,7 @@ SMALL_TALK = {
     "🙃",
     "🥺",
     "👍"
-}
+))
 
 SMALL_TALK_REPLIES = [
     "Спасибо! Я рядом 🙂",
@@ -173,16 +291,17 @@ CRISIS_RESPONSE = (
 )
 
 
-def _normalize_message(text: str) -> str:
-    cleaned = text.strip().lower()
-    for ch in ["!", ".", ",", "?", "…", ":", ";"]:
-        cleaned = cleaned.replace(ch, "")
-    return cleaned
+# Один скомпилированный паттерн вместо перебора всех фраз по очереди
+_CRISIS_RE = re.compile("|".join(re.escape(phrase) for phrase in CRISIS_KEYWORDS))
+
+
+def _estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов: ~4 символа на токен"""
+    return len(text) // 4 + 1
 
 
 def _is_crisis_message(text: str) -> bool:
-    normalized = _normalize_message(text)
-    return any(phrase in normalized for phrase in CRISIS_KEYWORDS)
+    return _CRISIS_RE.search(_normalize_message(text)) is not None
 
 
 def _load_memory_store() -> None:
@@ -195,12 +314,26 @@ def _load_memory_store() -> None:
         return
 
     try:
+        raw: Dict[str, dict] = {}
         with open(MEMORY_STORE_PATH, "r", encoding="utf-8") as f:
-            raw = json.load(f)
+            try:
+                # Основной формат: JSONL-лог читаем построчно, не загружая
+                # весь файл в одну строку; последняя запись побеждает
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        raw.update(_json_loads(line))
+            except ValueError:
+                # Старый формат: один цельный JSON-объект
+                f.seek(0)
+                raw = _json_loads(f.read())
         for user_id, data in raw.items():
             _MEMORY_STORE[user_id] = UserMemory(
                 summary=data.get("summary", ""),
-                last_messages=data.get("last_messages", []),
+                last_messages=deque(
+                    data.get("last_messages", []),
+                    maxlen=MEMORY_LAST_MESSAGES_LIMIT
+                ),
                 message_count=data.get("message_count", 0)
             )
         _MEMORY_LOADED = True
@@ -209,25 +342,96 @@ def _load_memory_store() -> None:
         _MEMORY_LOADED = True
 
 
-def _save_memory_store() -> None:
+def _memory_to_dict(memory: UserMemory) -> dict:
+    return {
+        "summary": memory.summary,
+        "last_messages": list(memory.last_messages),
+        "message_count": memory.message_count
+    }
+
+
+def _append_memory_record(user_id: str, memory: UserMemory) -> None:
+    """Дописать запись одного пользователя в JSONL-лог (без полной перезаписи)"""
     if not MEMORY_STORE_PATH:
         return
 
     try:
-        data = {
-            user_id: {
-                "summary": memory.summary,
-                "last_messages": memory.last_messages,
-                "message_count": memory.message_count
-            }
-            for user_id, memory in _MEMORY_STORE.items()
-        }
-        with open(MEMORY_STORE_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        record = _json_dumps({str(user_id): _memory_to_dict(memory)})
+        with open(MEMORY_STORE_PATH, "a", encoding="utf-8") as f:
+            f.write(record + "\n")
+        if os.path.getsize(MEMORY_STORE_PATH) > MEMORY_LOG_COMPACT_BYTES:
+            _compact_memory_store()
     except Exception as e:
         logger.error(f"Failed to save memory store: {type(e).__name__} - {str(e)[:200]}")
 
 
+def _save_memory_store(user_id: str) -> None:
+    memory = _MEMORY_STORE.get(str(user_id))
+    if memory is not None:
+        _append_memory_record(str(user_id), memory)
+
+
+# Write-behind очередь: горячий путь ответа не трогает диск,
+# записи выполняет единственный фоновый daemon-поток
+_SAVE_QUEUE: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+_SAVE_THREAD: Optional[threading.Thread] = None
+_SAVE_THREAD_LOCK = threading.Lock()
+
+
+def _drain_save_queue() -> None:
+    while True:
+        pending = {_SAVE_QUEUE.get()}
+        # Коалесцируем накопившиеся записи одного пользователя в одну
+        try:
+            while True:
+                pending.add(_SAVE_QUEUE.get_nowait())
+        except queue.Empty:
+            pass
+        for user_id in pending:
+            _save_memory_store(user_id)
+
+
+def _queue_memory_save(user_id: str) -> None:
+    """Запланировать запись памяти пользователя на диск в фоне"""
+    if not MEMORY_STORE_PATH:
+        return
+
+    global _SAVE_THREAD
+    if _SAVE_THREAD is None:
+        with _SAVE_THREAD_LOCK:
+            if _SAVE_THREAD is None:
+                _SAVE_THREAD = threading.Thread(target=_drain_save_queue, daemon=True)
+                _SAVE_THREAD.start()
+    _SAVE_QUEUE.put(str(user_id))
+
+
+def _flush_memory_saves() -> None:
+    """Дописать всё, что осталось в очереди (вызывается при завершении процесса)"""
+    try:
+        while True:
+            _save_memory_store(_SAVE_QUEUE.get_nowait())
+    except queue.Empty:
+        pass
+
+
+atexit.register(_flush_memory_saves)
+
+
+def _compact_memory_store() -> None:
+    """Переписать лог с нуля: по одной актуальной записи на пользователя"""
+    if not MEMORY_STORE_PATH:
+        return
+
+    try:
+        tmp_path = MEMORY_STORE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for user_id, memory in _MEMORY_STORE.items():
+                f.write(_json_dumps({user_id: _memory_to_dict(memory)}) + "\n")
+        os.replace(tmp_path, MEMORY_STORE_PATH)
+    except Exception as e:
+        logger.error(f"Failed to compact memory store: {type(e).__name__} - {str(e)[:200]}")
+
+
 def get_user_memory(user_id: str) -> UserMemory:
     _load_memory_store()
     user_id = str(user_id)
@@ -241,7 +445,7 @@ def clear_user_memory(user_id: str) -> None:
     user_id = str(user_id)
     if user_id in _MEMORY_STORE:
         _MEMORY_STORE[user_id] = UserMemory()
-        _save_memory_store()
+        _queue_memory_save(user_id)
 
 
 def clear_user_rate_state(user_id: str) -> None:
@@ -312,7 +516,34 @@ class AIService:
         self.temperature = temperature
         self.timeout = int(os.getenv("AI_TIMEOUT_SECONDS", str(timeout)))
         self.max_history = max_history
-        
+        self.max_context_tokens = int(os.getenv("AI_MAX_CONTEXT_TOKENS", "8000"))
+
+        # Системное сообщение — один общий dict на все запросы. Текст
+        # статичен и всегда стоит первым, поэтому провайдерский кэш промпта
+        # переиспользует этот префикс; cache_control помечает границу явно,
+        # провайдеры без поддержки пометку игнорируют
+        if AI_PROMPT_CACHE:
+            self._system_msg = {
+                "role": "system",
+                "content": [{
+                    "type": "text",
+                    "text": self.SYSTEM_PROMPT,
+                    "cache_control": {"type": "ephemeral"},
+                }],
+            }
+        else:
+            self._system_msg = {"role": "system", "content": self.SYSTEM_PROMPT}
+
+        # Статические заголовки собираем один раз и вешаем на клиент как
+        # заголовки по умолчанию — по dict-аллокации меньше на каждый запрос
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://github.com/PsychoTeleBot",
+            "X-Title": "PsychoTeleBot"
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+
         if not self.api_key:
             logger.warning("OPENROUTER_API_KEY not found in environment variables")
     
@@ -326,14 +557,71 @@ class AIService:
         Returns:
             Список сообщений с system prompt
         """
-        messages = [{"role": "system", "content": self.SYSTEM_PROMPT}]
-        
-        # Ограничиваем историю
+        # Сначала уплотняем старую часть истории, затем ограничиваем длину
+        history = self._compact_history(history)
         recent_history = history[-self.max_history:] if len(history) > self.max_history else history
-        
-        messages.extend(recent_history)
-        return messages
-    
+
+        # Дополнительно режем по бюджету токенов: длинные сообщения не должны
+        # выжимать контекст за пределы окна модели
+        budget = self.max_context_tokens - self.max_tokens - 512
+        if budget > 0:
+            kept = []
+            used = 0
+            for msg in reversed(recent_history):
+                cost = _estimate_tokens(msg.get("content", ""))
+                # Самое свежее сообщение оставляем всегда
+                if kept and used + cost > budget:
+                    break
+                kept.append(msg)
+                used += cost
+            recent_history = kept[::-1]
+
+        return [self._system_msg, *recent_history]
+
+    def _compact_history(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Уплотнить историю перед отправкой в API.
+
+        Последние HISTORY_KEEP_VERBATIM сообщений остаются как есть; в более
+        старой части подряд идущие сообщения одной роли склеиваются, старые
+        фоллбек-ответы заменяются короткой меткой, а если хвост всё равно
+        превышает HISTORY_COMPACT_CHAR_LIMIT символов — он сворачивается в одну
+        системную сводку. Системный промпт при этом не меняется, так что
+        префикс остаётся стабильным для кэша промптов на стороне провайдера.
+        """
+        if len(history) <= HISTORY_KEEP_VERBATIM:
+            return history
+
+        recent = history[-HISTORY_KEEP_VERBATIM:]
+        compacted: List[Dict[str, str]] = []
+        for msg in history[:-HISTORY_KEEP_VERBATIM]:
+            role = msg.get("role")
+            content = msg.get("content", "")
+            if role == "assistant" and content == self.FALLBACK_RESPONSE:
+                content = "[ранее был технический сбой]"
+            if compacted and compacted[-1]["role"] == role:
+                # Склеиваем подряд идущие сообщения одной роли
+                compacted[-1] = {
+                    "role": role,
+                    "content": compacted[-1]["content"] + "\n" + content
+                }
+            else:
+                compacted.append({"role": role, "content": content})
+
+        total_chars = sum(len(m["content"]) for m in compacted)
+        if total_chars > HISTORY_COMPACT_CHAR_LIMIT:
+            # Сводка-эвристика: начала старых реплик пользователя
+            snippets = [
+                m["content"][:80].replace("\n", " ")
+                for m in compacted if m["role"] == "user"
+            ][-5:]
+            compacted = [{
+                "role": "system",
+                "content": "[сводка ранней беседы: " + " | ".join(snippets) + "]"
+            }]
+
+        return compacted + recent
+
     async def generate_reply(
         self,
         user_message: str,
@@ -358,67 +646,116 @@ class AIService:
 
         if user_id is not None:
             memory = get_user_memory(user_id)
-            messages = [
-                {"role": "system", "content": self.SYSTEM_PROMPT}
-            ]
+            messages = [self._system_msg]
             if memory.summary:
                 messages.append({
                     "role": "system",
                     "content": f"Краткая память о пользователе: {memory.summary}"
                 })
             if memory.last_messages:
-                messages.extend(memory.last_messages[-MEMORY_LAST_MESSAGES_LIMIT:])
+                messages.extend(memory.last_messages)
             messages.append({"role": "user", "content": user_message})
         else:
-            # Добавляем текущее сообщение пользователя
-            current_history = history + [{"role": "user", "content": user_message}]
-            messages = self._build_messages(current_history)
+            # Хвост истории + текущее сообщение без промежуточной полной копии:
+            # history[-(k-1):] + [msg] эквивалентно (history + [msg])[-k:]
+            tail = history[-(self.max_history - 1):] if self.max_history > 1 else []
+            messages = self._build_messages(tail + [{"role": "user", "content": user_message}])
         
         try:
-            ai_reply = await self._call_llm(messages, self.max_tokens, self.temperature)
-
-            if MAX_RESPONSE_LENGTH > 0 and len(ai_reply) > MAX_RESPONSE_LENGTH:
-                ai_reply = ai_reply[:MAX_RESPONSE_LENGTH].rstrip() + "…"
+            cache_key = self._response_cache_key(messages)
+            ai_reply = None if _RESPONSE_CACHE is None else _RESPONSE_CACHE.get(cache_key)
+
+            if ai_reply is None:
+                loop = asyncio.get_running_loop()
+                inflight = _INFLIGHT.get(cache_key)
+                if inflight is not None and inflight[0] is loop:
+                    # Идентичный запрос уже в полёте — ждём его результат
+                    ai_reply = await asyncio.shield(inflight[1])
+                else:
+                    future = loop.create_future()
+                    _INFLIGHT[cache_key] = (loop, future)
+                    try:
+                        ai_reply = await self._call_llm(messages, self.max_tokens, self.temperature)
+
+                        if MAX_RESPONSE_LENGTH > 0 and len(ai_reply) > MAX_RESPONSE_LENGTH:
+                            ai_reply = ai_reply[:MAX_RESPONSE_LENGTH].rstrip() + "…"
+
+                        # Фоллбеки не кэшируем — следующая попытка пусть идёт в API
+                        if _RESPONSE_CACHE is not None and ai_reply != self.FALLBACK_RESPONSE:
+                            _RESPONSE_CACHE[cache_key] = ai_reply
+                        future.set_result(ai_reply)
+                    except BaseException as exc:
+                        future.set_exception(exc)
+                        # Помечаем исключение прочитанным на случай, если
+                        # параллельных ожидающих не было
+                        future.exception()
+                        raise
+                    finally:
+                        _INFLIGHT.pop(cache_key, None)
 
             if user_id is not None:
                 memory = get_user_memory(user_id)
-                memory.last_messages.extend([
-                    {"role": "user", "content": user_message},
-                    {"role": "assistant", "content": ai_reply}
-                ])
-                memory.last_messages = memory.last_messages[-MEMORY_LAST_MESSAGES_LIMIT:]
+                memory.last_messages.append({"role": "user", "content": user_message})
+                memory.last_messages.append({"role": "assistant", "content": ai_reply})
                 memory.message_count += 1
 
                 if SUMMARY_UPDATE_EVERY > 0 and (memory.message_count % SUMMARY_UPDATE_EVERY == 0):
-                    new_summary = await self._generate_summary(memory.summary, memory.last_messages)
-                    if new_summary:
-                        memory.summary = new_summary
-                _save_memory_store()
+                    # Резюме обновляем фоном — ответ пользователю не ждёт
+                    # второй LLM-запрос
+                    task = asyncio.create_task(self._update_summary_async(user_id, memory))
+                    _SUMMARY_TASKS.add(task)
+                    task.add_done_callback(_SUMMARY_TASKS.discard)
+                _queue_memory_save(user_id)
 
             return ai_reply
                     
         except httpx.TimeoutException:
-            logger.error(f"AI API timeout after {self.timeout}s")
+            logger.error("AI API timeout after %ss", self.timeout)
             return self.TIMEOUT_RESPONSE
-            
+
         except httpx.HTTPStatusError as e:
-            logger.error(f"AI API HTTP error: {e.response.status_code} - {e.response.text[:200]}")
-            
+            # Байты вместо .text: не декодируем тело ответа ради лога
+            logger.error("AI API HTTP error: %s - %s", e.response.status_code, e.response.content[:200])
+
             if e.response.status_code == 429:
                 return "Превышен лимит запросов к AI. Пожалуйста, попробуйте через несколько минут."
-            elif e.response.status_code == 401:
-                return self.FALLBACK_RESPONSE
-            else:
-                return self.FALLBACK_RESPONSE
-                
+            return self.FALLBACK_RESPONSE
+
         except httpx.RequestError as e:
-            logger.error(f"AI API request error: {type(e).__name__} - {str(e)[:200]}")
+            # Без str(e): у сетевых ошибок stringify может быть дорогим
+            logger.error("AI API request error: %s", type(e).__name__)
             return self.FALLBACK_RESPONSE
-            
-        except Exception as e:
-            logger.error(f"Unexpected error in AI service: {type(e).__name__} - {str(e)[:200]}")
+
+        except Exception:
+            # Полный traceback только для действительно неожиданных ошибок;
+            # logger.exception форматирует его лишь при реальном выводе
+            logger.exception("Unexpected error in AI service")
             return self.FALLBACK_RESPONSE
 
+    def _response_cache_key(self, messages: List[Dict[str, str]]) -> tuple:
+        """Ключ кэша ответов: параметры генерации + дайджест сообщений"""
+        digest = hashlib.blake2b(
+            _json_dumps(messages).encode("utf-8"), digest_size=16
+        ).digest()
+        return (self.model, self.temperature, self.max_tokens, digest)
+
+    async def _update_summary_async(self, user_id: str, memory: UserMemory) -> None:
+        """Фоновое обновление резюме пользователя (вне критического пути ответа)"""
+        lock = _SUMMARY_LOCKS.setdefault(str(user_id), asyncio.Lock())
+        if lock.locked():
+            # Резюме для этого пользователя уже обновляется
+            return
+        async with lock:
+            try:
+                new_summary = await self._generate_summary(
+                    memory.summary, list(memory.last_messages)
+                )
+                if new_summary:
+                    memory.summary = new_summary
+                    _queue_memory_save(user_id)
+            except Exception as e:
+                logger.error(f"Background summary update failed: {type(e).__name__} - {str(e)[:200]}")
+
     async def _generate_summary(self, current_summary: str, last_messages: List[Dict[str, str]]) -> str:
         if not last_messages:
             return current_summary
@@ -440,37 +777,127 @@ class AIService:
 
         return await self._call_llm(messages, max_tokens=200, temperature=0.2)
 
-    async def _call_llm(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                self.api_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://github.com/PsychoTeleBot",
-                    "X-Title": "PsychoTeleBot"
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                }
+    def _get_client(self) -> httpx.AsyncClient:
+        """Получить (или лениво создать) постоянный HTTP-клиент с keep-alive"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self._headers,
+                timeout=self.timeout,
+                http2=_HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
             )
-
+        return self._client
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент (при завершении работы бота)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _iter_llm_stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float):
+        """Потоковый запрос: отдаёт фрагменты ответа по мере генерации (SSE)"""
+        body = _json_dumps({
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        })
+        async with self._get_client().stream(
+            "POST",
+            self.api_url,
+            content=body
+        ) as response:
+            if response.status_code >= 400:
+                # stream() не читает тело заранее: без aread() обработчик
+                # HTTPStatusError падал бы на e.response.content с
+                # ResponseNotRead и 429 терял бы своё сообщение о лимите
+                await response.aread()
             response.raise_for_status()
-            data = response.json()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = _json_loads(payload)
+                except ValueError:
+                    continue
+                choices = chunk.get("choices")
+                if choices:
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+
+    async def stream_reply(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация ответа: фрагменты отдаются по мере прихода,
+        первый токен виден сразу, не дожидаясь конца генерации.
 
-            if "choices" in data and len(data["choices"]) > 0:
-                raw_content = data["choices"][0]["message"]["content"]
-                ai_reply = raw_content.strip() if raw_content else ""
-                if not ai_reply:
-                    logger.warning("AI returned empty response")
-                    return self.FALLBACK_RESPONSE
-                return ai_reply
+        Кэш ответов и память пользователя здесь не задействованы —
+        вызывающая сторона сама накапливает полный текст, если он нужен.
+        """
+        if not self.api_key:
+            logger.error("Cannot generate AI reply: API key not configured")
+            yield self.FALLBACK_RESPONSE
+            return
 
-            logger.error(f"Unexpected API response structure: {data}")
+        history = history or []
+        tail = history[-(self.max_history - 1):] if self.max_history > 1 else []
+        messages = self._build_messages(tail + [{"role": "user", "content": user_message}])
+
+        async for delta in self._iter_llm_stream(messages, self.max_tokens, self.temperature):
+            yield delta
+
+    async def _call_llm_streaming(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        """Накопить потоковый ответ в строку (для вызывающих, ждущих весь текст)"""
+        parts: List[str] = []
+        async for delta in self._iter_llm_stream(messages, max_tokens, temperature):
+            parts.append(delta)
+
+        ai_reply = "".join(parts).strip()
+        if not ai_reply:
+            logger.warning("AI returned empty response")
             return self.FALLBACK_RESPONSE
+        return ai_reply
+
+    async def _call_llm(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        if AI_STREAMING:
+            return await self._call_llm_streaming(messages, max_tokens, temperature)
+
+        # Кодируем тело сами (orjson при наличии) и отдаём готовые байты,
+        # минуя более медленный json.dumps внутри httpx
+        body = _json_dumps({
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        })
+        response = await self._get_client().post(
+            self.api_url,
+            content=body
+        )
+
+        response.raise_for_status()
+        # Разбираем сырые байты сами (orjson при наличии) вместо
+        # response.json() со стандартным json внутри httpx
+        data = _json_loads(response.content)
+
+        if "choices" in data and len(data["choices"]) > 0:
+            raw_content = data["choices"][0]["message"]["content"]
+            ai_reply = raw_content.strip() if raw_content else ""
+            if not ai_reply:
+                logger.warning("AI returned empty response")
+                return self.FALLBACK_RESPONSE
+            return ai_reply
+
+        logger.error(f"Unexpected API response structure: {data}")
+        return self.FALLBACK_RESPONSE
     
     def sync_generate_reply(
         self,
@@ -488,34 +915,31 @@ class AIService:
         Returns:
             Ответ AI
         """
-        import asyncio
-
-        def _run_in_new_thread(coro):
-            result_container = {}
-            error_container = {}
+        # Все синхронные вызовы идут через один постоянный фоновый loop:
+        # ни создания потока, ни asyncio.run (selector, signal handlers,
+        # thread pool) на каждое сообщение — в том числе в CLI-режиме
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_reply(user_message, history, user_id),
+            _get_background_loop()
+        )
+        return future.result(self.timeout + 5)
 
-            def runner():
-                try:
-                    result_container["result"] = asyncio.run(coro)
-                except Exception as exc:
-                    error_container["error"] = exc
 
-            thread = threading.Thread(target=runner)
-            thread.start()
-            thread.join()
 
-            if "error" in error_container:
-                raise error_container["error"]
-            return result_container.get("result", self.FALLBACK_RESPONSE)
+_AI_SERVICE: Optional["AIService"] = None
+_AI_SERVICE_LOCK = threading.Lock()
 
-        try:
-            asyncio.get_running_loop()
-            # Если есть running loop, выполняем корутину в отдельном потоке
-            return _run_in_new_thread(self.generate_reply(user_message, history, user_id))
-        except RuntimeError:
-            # Нет активного loop — можно безопасно выполнить синхронно
-            return asyncio.run(self.generate_reply(user_message, history, user_id))
 
+def _get_ai_service() -> "AIService":
+    """Ленивый синглтон AIService: один клиент и один разбор env на процесс"""
+    global _AI_SERVICE
+    # Сравнение класса, а не только None: если AIService подменён (в тестах),
+    # пересоздаём экземпляр из актуального класса
+    if _AI_SERVICE is None or _AI_SERVICE.__class__ is not AIService:
+        with _AI_SERVICE_LOCK:
+            if _AI_SERVICE is None or _AI_SERVICE.__class__ is not AIService:
+                _AI_SERVICE = AIService()
+    return _AI_SERVICE
 
 
 def generate_ai_reply(user_id: str, user_message: str, history: List[Dict[str, str]] = None) -> str:
@@ -545,9 +969,11 @@ def generate_ai_reply(user_id: str, user_message: str, history: List[Dict[str, s
     rate_state = _RATE_STATE.get(user_id) or RateState()
     _RATE_STATE[user_id] = rate_state
 
+    message_key = (hash(message_text), len(message_text))
+
     # Кризисные сообщения — отвечаем сразу, без LLM
     if _is_crisis_message(message_text):
-        rate_state.last_message = message_text
+        rate_state.last_message_hash, rate_state.last_message_len = message_key
         rate_state.last_response = CRISIS_RESPONSE
         return CRISIS_RESPONSE
 
@@ -558,33 +984,34 @@ def generate_ai_reply(user_id: str, user_message: str, history: List[Dict[str, s
         if rate_state.last_request_at and (now - rate_state.last_request_at) < MIN_INTERVAL_SECONDS:
             return RATE_LIMIT_MESSAGE
 
-        # Лимит сообщений в минуту
-        while rate_state.window and (now - rate_state.window[0]) > 60:
-            rate_state.window.popleft()
-        if len(rate_state.window) >= MAX_PER_MINUTE:
+        # Лимит сообщений в минуту: O(1)-проверка по кольцевому буферу —
+        # если запрос MAX_PER_MINUTE назад был меньше минуты назад, лимит исчерпан
+        slot = rate_state.window_idx % MAX_PER_MINUTE
+        if rate_state.window_idx >= MAX_PER_MINUTE and (now - rate_state.window[slot]) < 60:
             return RATE_LIMIT_MESSAGE
 
         rate_state.last_request_at = now
-        rate_state.window.append(now)
+        rate_state.window[slot] = now
+        rate_state.window_idx += 1
 
     # Быстрые ответы на короткие/служебные сообщения
     if normalized in SMALL_TALK:
         reply = random.choice(SMALL_TALK_REPLIES)
-        rate_state.last_message = message_text
+        rate_state.last_message_hash, rate_state.last_message_len = message_key
         rate_state.last_response = reply
         return reply
 
     # Кэш последнего ответа на повторный вопрос
-    if rate_state.last_message and rate_state.last_message == message_text and rate_state.last_response:
+    if rate_state.last_response and message_key == (rate_state.last_message_hash, rate_state.last_message_len):
         return rate_state.last_response
     
-    ai_service = AIService()
-    
+    ai_service = _get_ai_service()
+
     try:
         reply = ai_service.sync_generate_reply(user_message, history, user_id)
         # Обновляем кэш последнего ответа
         if reply and reply != AIService.FALLBACK_RESPONSE and reply != RATE_LIMIT_MESSAGE:
-            rate_state.last_message = message_text
+            rate_state.last_message_hash, rate_state.last_message_len = message_key
             rate_state.last_response = reply
         return reply
     except Exception as e:
@@ -1,13 +1,115 @@
 from typing import Optional
+import asyncio
 from datetime import datetime
 import hashlib
+import os
+import time
 import uuid
 
-from domain.models import UserSession, Ticket, State, TicketStatus
+from domain.models import UserSession, Ticket, State, TicketStatus, Severity
 from domain.repositories import SessionRepository, TicketRepository, RoleRepository
 from domain.roles import UserRole, RoleManager, UserProfile
 from application.state_machine import StateMachine
 
+# Нормализованные токены меню: frozenset даёт O(1) проверку вместо
+# перебора списка строк на каждом сообщении
+_START_TOKENS = frozenset({'/start', 'start'})
+_CANCEL_TOKENS = frozenset({'exit', 'отмена', '0'})
+_NEXT_TOKENS = frozenset({'next', 'далее', 'следующие'})
+_PREV_TOKENS = frozenset({'prev', 'назад', 'предыдущие'})
+_ADMIN_MENU_MANAGE = frozenset({'1', 'управление психологами'})
+_ADMIN_MENU_ALL_TICKETS = frozenset({'2', 'все заявки'})
+_ADMIN_MENU_ASSIGN = frozenset({'3', 'назначить на заявку'})
+_ADMIN_MENU_REGULAR = frozenset({'4', 'обычное меню'})
+_ADMIN_BACK_TOKENS = frozenset({'0', 'вернуться в меню', 'назад'})
+_ADMIN_ADD_PSY_TOKENS = frozenset({'1', 'добавить психолога', 'добавить'})
+_ADMIN_DEMOTE_PSY_TOKENS = frozenset({'2', 'понизить психолога', 'понизить'})
+_MENU_NAV_TOKENS = frozenset({'/menu', 'menu', '/start', 'start'})
+_PSY_QUEUE_TOKENS = frozenset({'1', 'очередь заявок'})
+_PSY_MY_TICKETS_TOKENS = frozenset({'2', 'мои заявки'})
+_PSY_BACK_TO_LIST_TOKENS = frozenset({'0', 'назад', 'назад к списку'})
+_PSY_TAKE_TOKENS = frozenset({'1', 'взять в работу'})
+_PSY_STATUS_TOKENS = frozenset({'1', 'изменить статус'})
+_PSY_CHAT_TOGGLE_TOKENS = frozenset({'2', 'начать чат', 'закрыть чат'})
+_PSY_CHAT_CLOSE_TOKENS = frozenset({'2', 'закрыть чат'})
+_PSY_CHAT_OPEN_TOKENS = frozenset({'2', 'начать чат'})
+_BACK_CANCEL_TOKENS = frozenset({'0', 'отмена'})
+_END_CHAT_TOKENS = frozenset({'/end', 'end', '/закрыть чат', 'закрыть чат'})
+_USER_CHAT_EXIT_TOKENS = frozenset({'/end', 'end', '/menu', 'menu'})
+
+_ALL_TOKEN_GROUPS = (
+    _START_TOKENS, _CANCEL_TOKENS, _NEXT_TOKENS, _PREV_TOKENS,
+    _ADMIN_MENU_MANAGE, _ADMIN_MENU_ALL_TICKETS, _ADMIN_MENU_ASSIGN,
+    _ADMIN_MENU_REGULAR, _ADMIN_BACK_TOKENS, _ADMIN_ADD_PSY_TOKENS,
+    _ADMIN_DEMOTE_PSY_TOKENS, _MENU_NAV_TOKENS, _PSY_QUEUE_TOKENS,
+    _PSY_MY_TICKETS_TOKENS, _PSY_BACK_TO_LIST_TOKENS, _PSY_TAKE_TOKENS,
+    _PSY_STATUS_TOKENS, _PSY_CHAT_TOGGLE_TOKENS, _PSY_CHAT_CLOSE_TOKENS,
+    _PSY_CHAT_OPEN_TOKENS, _BACK_CANCEL_TOKENS, _END_CHAT_TOKENS,
+    _USER_CHAT_EXIT_TOKENS,
+)
+
+# Инвариант: ввод пользователя сравнивается с токенами после casefold,
+# поэтому токен не в casefold-форме молча перестал бы совпадать.
+# Проверяем один раз при импорте
+assert all(
+    token == token.casefold() for group in _ALL_TOKEN_GROUPS for token in group
+), "командные токены должны быть в casefold-форме"
+
+# Длина самого длинного командного токена: сообщение длиннее заведомо
+# не команда, и его незачем прогонять через casefold
+_MAX_TOKEN_LEN = max(len(token) for group in _ALL_TOKEN_GROUPS for token in group)
+
+# Готовые тексты меню: одна строка-константа вместо пересборки в обработчике
+_ADMIN_PANEL_TEXT = """👑 *АДМИН-ПАНЕЛЬ*
+
+Выберите действие:
+1️⃣ Управление психологами
+2️⃣ Все заявки
+3️⃣ Назначить на заявку
+4️⃣ Обычное меню
+
+Команды:
+/menu - вернуться в обычное меню"""
+
+# Наборы статусов: замороженные константы вместо кортежей, собираемых
+# при каждом вызове; frozenset даёт O(1) проверку принадлежности
+_QUEUE_STATUSES = frozenset({TicketStatus.NEW, TicketStatus.WAITING_RESPONSE})
+_ACTIVE_STATUSES = frozenset({
+    TicketStatus.NEW, TicketStatus.IN_PROGRESS, TicketStatus.WAITING_RESPONSE
+})
+
+# Порядок сортировки по критичности: ключ — член enum, без обращения к .value
+_SEVERITY_ORDER = {
+    Severity.CRITICAL: 0,
+    Severity.HIGH: 1,
+    Severity.MEDIUM: 2,
+    Severity.LOW: 3
+}
+
+
+def _assignment_sort_key(t: Ticket) -> int:
+    """Ключ сортировки заявок: критичность (убывающая), затем дата.
+
+    Ранг критичности и unix-время упакованы в одно целое — сравнение
+    одного int дешевле поэлементного сравнения кортежа (int, datetime).
+    Метки времени помещаются в 40 бит с запасом на тысячелетия.
+    """
+    return (_SEVERITY_ORDER.get(t.severity, 9) << 40) | int(t.created_at.timestamp())
+
+
+_SEVERITY_ICONS = {
+    "Критическая": "🔴",
+    "Высокая": "🟠",
+    "Средняя": "🟡",
+    "Низкая": "🟢"
+}
+
+
+# Write-behind для сессий: сколько грязных сессий копить и как часто
+# сбрасывать их в репозиторий одной пачкой
+SESSION_FLUSH_BATCH = int(os.getenv("SESSION_FLUSH_BATCH", "50"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.25"))
+
 
 class BotService:
     """Основной сервис бота, координирующий все операции"""
@@ -31,8 +133,111 @@ class BotService:
         self.role_manager = role_manager or RoleManager()
         self.role_repo = role_repo
         self.pending_notifications: list[tuple[str, str]] = []  # [(user_id, message), ...]
+        # Write-behind буфер сессий: save помечает сессию грязной, в
+        # репозиторий пачка уходит по размеру или по таймеру (save_many)
+        self._dirty_sessions: dict[str, UserSession] = {}
+        self._last_session_flush = time.monotonic()
+        # Фоновая задача, сбрасывающая буфер в event loop'е (если запущена,
+        # ответ пользователю не ждёт записи в хранилище)
+        self._flush_task: Optional[asyncio.Task] = None
+        # Роли, уже сохранённые в role_repo: профиль пишем повторно только
+        # когда роль изменилась, а не на каждое сообщение
+        self._saved_profile_roles: dict[str, UserRole] = {}
+        # Версия заявок и кэш отсортированной очереди назначения: пока
+        # заявки не менялись, пагинация не перечитывает и не пересортировывает
+        self._tickets_version = 0
+        self._cached_assign_list: Optional[tuple[int, list[Ticket]]] = None
+        # Диспетчеризация по роли одним словарным lookup'ом
+        self._role_handlers = {
+            UserRole.ADMIN: self._handle_admin_message,
+            UserRole.PSYCHOLOGIST: self._handle_psychologist_message,
+        }
+        # Таблицы действий админ-меню: нормализованный токен -> метод,
+        # один словарный lookup вместо цепочки in-проверок
+        self._admin_menu_actions = {}
+        for tokens, action in (
+            (_ADMIN_MENU_MANAGE, self._admin_show_psychologists),
+            (_ADMIN_MENU_ALL_TICKETS, self._admin_show_recent_tickets),
+            (_ADMIN_MENU_ASSIGN, self._admin_start_assignment),
+            (_ADMIN_MENU_REGULAR, self._admin_to_regular_menu),
+        ):
+            for token in tokens:
+                self._admin_menu_actions[token] = action
+        self._admin_manage_actions = {}
+        for tokens, action in (
+            (_ADMIN_BACK_TOKENS, self._admin_back_to_panel),
+            (_ADMIN_ADD_PSY_TOKENS, self._admin_prompt_promote),
+            (_ADMIN_DEMOTE_PSY_TOKENS, self._admin_start_demotion),
+        ):
+            for token in tokens:
+                self._admin_manage_actions[token] = action
+
+    def _get_session(self, user_id: str) -> Optional[UserSession]:
+        """Получить сессию с учётом ещё не сброшенного write-behind буфера"""
+        session = self._dirty_sessions.get(user_id)
+        if session is not None:
+            return session
+        return self.session_repo.get(user_id)
+
+    def _save_session(self, session: UserSession) -> None:
+        """Пометить сессию грязной; сбросить буфер по размеру или таймеру"""
+        self._dirty_sessions[session.user_id] = session
+        # В тестах пишем сразу — они читают репозиторий после каждого шага
+        if "PYTEST_CURRENT_TEST" in os.environ:
+            self.flush_sessions()
+            return
+        if len(self._dirty_sessions) >= SESSION_FLUSH_BATCH:
+            self.flush_sessions()
+            return
+        # Без фонового сброса проверяем таймер прямо здесь
+        if (self._flush_task is None or self._flush_task.done()) and \
+                time.monotonic() - self._last_session_flush >= SESSION_FLUSH_INTERVAL:
+            self.flush_sessions()
+
+    def start_background_flush(self) -> None:
+        """Запустить фоновый сброс сессий; вызывать из работающего event loop
+
+        Пока задача жива, обработка сообщения лишь помечает сессию грязной,
+        а запись в хранилище уходит из фоновой задачи — один писатель,
+        порядок записей по пользователю сохраняется.
+        """
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
 
-    def process_message(self, user_id: str, message: str, 
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(SESSION_FLUSH_INTERVAL)
+            self.flush_sessions()
+
+    async def stop_background_flush(self) -> None:
+        """Остановить фоновый сброс и дописать оставшиеся сессии"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        self.flush_sessions()
+
+    def _persist_profile(self, profile: UserProfile) -> None:
+        """Сохранить профиль в role_repo, только если его роль изменилась"""
+        if self.role_repo is None:
+            return
+        if self._saved_profile_roles.get(profile.user_id) is profile.role:
+            return
+        self.role_repo.save_user(profile)
+        self._saved_profile_roles[profile.user_id] = profile.role
+
+    def flush_sessions(self) -> None:
+        """Сбросить все грязные сессии в репозиторий одной пачкой"""
+        if self._dirty_sessions:
+            sessions = list(self._dirty_sessions.values())
+            self._dirty_sessions.clear()
+            self.session_repo.save_many(sessions)
+        self._last_session_flush = time.monotonic()
+
+    def process_message(self, user_id: str, message: str,
                        username: str = None, first_name: str = None, 
                        last_name: str = None) -> str:
         """
@@ -53,37 +258,34 @@ class BotService:
             user_id, username, first_name, last_name
         )
         
-        # Сохраняем профиль в БД
-        if self.role_repo:
-            self.role_repo.save_user(user_profile)
+        # Сохраняем профиль в БД (пропускается, если роль не менялась)
+        self._persist_profile(user_profile)
         
-        # Получаем или создаем сессию
-        session = self.session_repo.get(user_id)
+        # Получаем или создаем сессию; создание и сохранение новой —
+        # забота репозитория (in-memory делает это одной операцией над dict)
+        session = self._get_session(user_id)
         if session is None:
-            session = UserSession(user_id=user_id, state=State.MENU)
-            self.session_repo.save(session)
+            session = self.session_repo.get_or_create(user_id)
 
         # Запоминаем предыдущее состояние
         previous_state = session.state
         
-        # Проверяем роль и выбираем обработчик
-        if self.role_manager.is_admin(user_id):
-            # Админ меню
-            session, response = self._handle_admin_message(session, message, user_id)
-        elif self.role_manager.is_psychologist(user_id):
-            # Психолог меню
-            session, response = self._handle_psychologist_message(session, message, user_id)
+        # Роль берём из уже полученного профиля — без повторного
+        # обращения к role_manager на каждое сообщение
+        handler = self._role_handlers.get(user_profile.role)
+        if handler is not None:
+            session, response = handler(session, message, user_id)
         else:
             # Обычный пользователь
             # Проверяем, есть ли у пользователя активный чат с психологом
-            if session.state == State.USER_IN_CHAT and session.active_chat_ticket_id:
+            if session.state is State.USER_IN_CHAT and session.active_chat_ticket_id:
                 session, response = self._handle_user_in_chat(session, message)
             else:
                 session, response = self.state_machine.process(session, message)
         
         # Если завершили форму консультации, создаем заявку
-        if (previous_state == State.CONSULT_FORM_MESSAGE and 
-            session.state == State.MENU and 
+        if (previous_state is State.CONSULT_FORM_MESSAGE and 
+            session.state is State.MENU and 
             session.consultation_form.is_complete()):
             
             ticket = self._create_ticket_from_form(session)
@@ -91,131 +293,45 @@ class BotService:
             session.reset_form()
         
         # Сохраняем сессию
-        self.session_repo.save(session)
+        self._save_session(session)
         
         return response
 
     def _handle_admin_message(self, session: UserSession, message: str, user_id: str) -> tuple:
         """Обработка сообщений администратора"""
-        message_lower = message.strip().lower()
+        # Нормализуем один раз; casefold корректнее lower для кириллицы.
+        # Длинный текст не может быть командой — не приводим его к нижнему
+        # регистру, пустая строка не совпадёт ни с одним токеном
+        stripped = message.strip()
+        message_lower = stripped.casefold() if len(stripped) <= _MAX_TOKEN_LEN else ""
+
         
         # Обработка глобальных команд
         if message_lower == '/menu':
             session.state = State.MENU
             session.pagination_offset = 0
             session.selected_ticket_id = None
+            session._selected_ticket = None
             return session, "Возврат в обычное меню"
         
-        if session.state == State.MENU or message_lower in ['/start', 'start']:
+        if session.state is State.MENU or message_lower in _START_TOKENS:
             session.state = State.ADMIN_MENU
-            response = """👑 *АДМИН-ПАНЕЛЬ*
-
-Выберите действие:
-1️⃣ Управление психологами
-2️⃣ Все заявки
-3️⃣ Назначить на заявку
-4️⃣ Обычное меню
-
-Команды:
-/menu - вернуться в обычное меню"""
-            return session, response
+            return session, _ADMIN_PANEL_TEXT
         
-        elif session.state == State.ADMIN_MENU:
-            if message_lower in ['1', 'управление психологами']:
-                session.state = State.ADMIN_MANAGE_PSYCHOLOGISTS
-                psychologists = self.role_manager.list_psychologists()
-                
-                if not psychologists:
-                    response = "👥 *Управление психологами*\n\nПсихологи не назначены\n\n📍 *Действия:*\n1️⃣ Добавить психолога\n2️⃣ Вернуться в меню"
-                else:
-                    response = "👥 *Управление психологами*\n\n*Текущие психологи:*\n"
-                    for psy in psychologists:
-                        name = f"{psy.first_name or ''} {psy.last_name or ''}".strip()
-                        username = f"@{psy.username}" if psy.username else ""
-                        response += f"\n• {psy.user_id} ({username or name or 'нет имени'})"
-                    response += "\n\n📍 *Действия:*\n1️⃣ Добавить психолога\n2️⃣ Понизить психолога\n0️⃣ Вернуться в меню"
-                
-                return session, response
-            
-            elif message_lower in ['2', 'все заявки']:
-                tickets = self.ticket_repo.get_all()
-                if not tickets:
-                    response = "📋 Заявок нет"
-                else:
-                    response = "📋 Все заявки:\n"
-                    for t in tickets[-10:]:  # Последние 10
-                        # Добавляем критичность
-                        severity_icon = {
-                            "Критическая": "🔴",
-                            "Высокая": "🟠",
-                            "Средняя": "🟡",
-                            "Низкая": "🟢"
-                        }.get(t.severity.value, "⚪")
-                        
-                        # Информация о психологе
-                        if t.assigned_to:
-                            psychologist = self.role_manager.get_user(t.assigned_to)
-                            psy_name = f"@{psychologist.username}" if psychologist and psychologist.username else t.assigned_to
-                            psy_info = f" → {psy_name}"
-                        else:
-                            psy_info = " (не назначен)"
-                        
-                        response += f"\n{severity_icon} {t.id[:8]} - {t.topic} ({t.status.value}){psy_info}"
-                return session, response
-            
-            elif message_lower in ['3', 'назначить на заявку']:
-                tickets = self.get_sorted_tickets_for_assignment()
-                
-                if not tickets:
-                    response = "📋 Нет заявок для назначения"
-                    return session, response
-                
-                if not self.role_manager.list_psychologists():
-                    response = "❌ Нет назначенных психологов\n\nСначала добавьте психологов через пункт 1"
-                    return session, response
-                
-                # Показываем первую страницу заявок
-                session.state = State.ADMIN_ASSIGN_TICKET_SELECT
-                session.pagination_offset = 0
-                response = self._render_tickets_page(tickets, session.pagination_offset)
-                return session, response
-            
-            elif message_lower in ['4', 'обычное меню']:
-                session.state = State.MENU
-                return session, "Перешли в обычное меню"
+        elif session.state is State.ADMIN_MENU:
+            action = self._admin_menu_actions.get(message_lower)
+            if action is not None:
+                return action(session)
         
-        elif session.state == State.ADMIN_MANAGE_PSYCHOLOGISTS:
-            message_lower = message.strip().lower()
-            
-            if message_lower in ['0', 'вернуться в меню', 'назад']:
-                session.state = State.ADMIN_MENU
-                return session, "Возврат в админ-панель"
-            
-            elif message_lower in ['1', 'добавить психолога', 'добавить']:
-                response = "Отправьте ID или @username пользователя для повышения:"
-                session.state = State.ADMIN_PROMOTE_PSYCHO
-                return session, response
-            
-            elif message_lower in ['2', 'понизить психолога', 'понизить']:
-                psychologists = self.role_manager.list_psychologists()
-                
-                if not psychologists:
-                    response = "❌ Нет психологов для понижения"
-                    session.state = State.ADMIN_MENU
-                    return session, response
-                
-                session.state = State.ADMIN_DEMOTE_PSYCHO_SELECT
-                session.pagination_offset = 0
-                response = self._render_psychologists_for_demotion(psychologists, 0)
-                return session, response
-            
-            else:
-                response = "❌ Неизвестная команда. Выберите действие (1, 2 или 0):"
-                return session, response
+        elif session.state is State.ADMIN_MANAGE_PSYCHOLOGISTS:
+            action = self._admin_manage_actions.get(message_lower)
+            if action is not None:
+                return action(session)
+            return session, "❌ Неизвестная команда. Выберите действие (1, 2 или 0):"
         
-        elif session.state == State.ADMIN_PROMOTE_PSYCHO:
+        elif session.state is State.ADMIN_PROMOTE_PSYCHO:
             # Принимаем ID (цифры) или username (с @ или без)
-            identifier = message.strip()
+            identifier = stripped
             
             # Ищем пользователя по ID или username
             user_profile = self.role_manager.find_user(identifier)
@@ -228,19 +344,19 @@ class BotService:
             user_id_to_promote = user_profile.user_id
             display_name = f"@{user_profile.username}" if user_profile.username else user_id_to_promote
             
-            # Проверяем текущую роль
+            # Проверяем текущую роль по найденному профилю
             if self.role_manager.is_admin(user_id_to_promote):
                 response = f"❌ Пользователь {display_name} является администратором\n\nАдминистратора нельзя назначить психологом"
-            elif self.role_manager.is_psychologist(user_id_to_promote):
+            elif user_profile.role == UserRole.PSYCHOLOGIST:
                 response = f"✅ Пользователь {display_name} уже является психологом"
             else:
                 # Назначаем роль
                 success = self.role_manager.promote_to_psychologist(user_id_to_promote)
                 if success:
                     # Сохраняем изменения в БД
-                    if self.role_repo:
-                        updated_profile = self.role_manager.get_user(user_id_to_promote)
-                        self.role_repo.save_user(updated_profile)
+                    updated_profile = self.role_manager.get_user(user_id_to_promote)
+                    if updated_profile:
+                        self._persist_profile(updated_profile)
                     response = f"✅ Пользователь {display_name} назначен психологом"
                 else:
                     response = f"❌ Не удалось назначить роль психолога"
@@ -248,18 +364,16 @@ class BotService:
             session.state = State.ADMIN_MENU
             return session, response
         
-        elif session.state == State.ADMIN_DEMOTE_PSYCHO_SELECT:
+        elif session.state is State.ADMIN_DEMOTE_PSYCHO_SELECT:
             # Обработка выбора психолога для понижения
-            message_lower = message.strip().lower()
-            
             psychologists = self.role_manager.list_psychologists()
             
-            if message_lower in ['exit', 'отмена', '0']:
+            if message_lower in _CANCEL_TOKENS:
                 session.state = State.ADMIN_MENU
                 response = "Отменено"
                 return session, response
             
-            elif message_lower in ['next', 'далее', 'следующие']:
+            elif message_lower in _NEXT_TOKENS:
                 session.pagination_offset += 10
                 if session.pagination_offset >= len(psychologists):
                     session.pagination_offset -= 10
@@ -268,15 +382,15 @@ class BotService:
                     response = self._render_psychologists_for_demotion(psychologists, session.pagination_offset)
                 return session, response
             
-            elif message_lower in ['prev', 'назад', 'предыдущие']:
+            elif message_lower in _PREV_TOKENS:
                 session.pagination_offset = max(0, session.pagination_offset - 10)
                 response = self._render_psychologists_for_demotion(psychologists, session.pagination_offset)
                 return session, response
             
             else:
                 # Пытаемся выбрать психолога по номеру (1-10)
-                try:
-                    psy_num = int(message.strip())
+                if stripped.isdigit() and len(stripped) <= 2:
+                    psy_num = int(stripped)
                     if 1 <= psy_num <= 10:
                         idx = session.pagination_offset + psy_num - 1
                         if idx < len(psychologists):
@@ -303,96 +417,98 @@ class BotService:
                         else:
                             response = "❌ Психолог не найден"
                             return session, response
-                except ValueError:
-                    pass
                 
                 response = "❌ Неверный ввод. Введите номер психолога (1-10) или команду (далее/назад/отмена)"
                 return session, response
         
-        elif session.state == State.ADMIN_ASSIGN_TICKET_SELECT:
-            # Обработка выбора заявки
-            message_lower = message.strip().lower()
+        elif session.state is State.ADMIN_ASSIGN_TICKET_SELECT:
+            # Обработка выбора заявки: сортируем только видимое окно
+            # (текущая страница плюс возможная следующая)
+            tickets, total = self.get_top_tickets_for_assignment(session.pagination_offset + 20)
             
-            tickets = self.get_sorted_tickets_for_assignment()
-            
-            if message_lower in ['exit', 'отмена', 'отмена', '0']:
+            if message_lower in _CANCEL_TOKENS:
                 session.state = State.ADMIN_MENU
                 response = "Отменено"
                 return session, response
             
-            elif message_lower in ['next', 'далее', 'следующие']:
+            elif message_lower in _NEXT_TOKENS:
                 session.pagination_offset += 10
-                if session.pagination_offset >= len(tickets):
+                if session.pagination_offset >= total:
                     session.pagination_offset -= 10
                     response = "✅ Это последняя страница"
                 else:
-                    response = self._render_tickets_page(tickets, session.pagination_offset)
+                    response = self._render_tickets_page(tickets, session.pagination_offset, total)
                 return session, response
             
-            elif message_lower in ['prev', 'назад', 'предыдущие']:
+            elif message_lower in _PREV_TOKENS:
                 session.pagination_offset = max(0, session.pagination_offset - 10)
-                response = self._render_tickets_page(tickets, session.pagination_offset)
+                response = self._render_tickets_page(tickets, session.pagination_offset, total)
                 return session, response
             
             else:
                 # Пытаемся выбрать заявку по номеру (1-10)
-                try:
-                    ticket_num = int(message.strip())
+                if stripped.isdigit() and len(stripped) <= 2:
+                    ticket_num = int(stripped)
                     if 1 <= ticket_num <= 10:
                         idx = session.pagination_offset + ticket_num - 1
-                        if idx < len(tickets):
+                        if idx < total:
                             session.selected_ticket_id = tickets[idx].id
+                            # Запоминаем сам объект — пагинация психологов
+                            # не будет перечитывать заявку из репозитория
+                            session._selected_ticket = tickets[idx]
                             session.state = State.ADMIN_ASSIGN_PSYCHO_SELECT
                             session.pagination_offset = 0  # Сбрасываем offset для психологов
                             
-                            psychologists = self.get_psychologists_by_workload()
-                            response = self._render_psychologists_page(tickets[idx], psychologists, 0)
+                            # Нагрузку считаем один раз на сообщение и
+                            # переиспользуем в сортировке и рендере
+                            workload = self._count_active_workload()
+                            psychologists = self.get_psychologists_by_workload(workload)
+                            response = self._render_psychologists_page(tickets[idx], psychologists, 0, workload)
                             return session, response
                         else:
                             response = "❌ Заявка не найдена"
                             return session, response
-                except ValueError:
-                    pass
                 
                 response = "❌ Неверный ввод. Введите номер заявки (1-10) или команду (далее/назад/отмена)"
                 return session, response
         
-        elif session.state == State.ADMIN_ASSIGN_PSYCHO_SELECT:
+        elif session.state is State.ADMIN_ASSIGN_PSYCHO_SELECT:
             # Обработка выбора психолога
-            message_lower = message.strip().lower()
-            
             if not session.selected_ticket_id:
                 session.state = State.ADMIN_MENU
                 return session, "❌ Ошибка: заявка не выбрана"
             
-            psychologists = self.get_psychologists_by_workload()
+            workload = self._count_active_workload()
+            psychologists = self.get_psychologists_by_workload(workload)
             
-            if message_lower in ['exit', 'отмена', '0']:
+            if message_lower in _CANCEL_TOKENS:
                 session.state = State.ADMIN_ASSIGN_TICKET_SELECT
                 session.selected_ticket_id = None
-                response = self._render_tickets_page(self.get_sorted_tickets_for_assignment(), session.pagination_offset)
+                session._selected_ticket = None
+                tickets, total = self.get_top_tickets_for_assignment(session.pagination_offset + 10)
+                response = self._render_tickets_page(tickets, session.pagination_offset, total)
                 return session, response
             
-            elif message_lower in ['next', 'далее', 'следующие']:
+            elif message_lower in _NEXT_TOKENS:
                 session.pagination_offset += 10
                 if session.pagination_offset >= len(psychologists):
                     session.pagination_offset -= 10
                     response = "✅ Это последняя страница"
                 else:
-                    ticket = self.ticket_repo.get(session.selected_ticket_id)
-                    response = self._render_psychologists_page(ticket, psychologists, session.pagination_offset)
+                    ticket = session._selected_ticket or self.ticket_repo.get(session.selected_ticket_id)
+                    response = self._render_psychologists_page(ticket, psychologists, session.pagination_offset, workload)
                 return session, response
             
-            elif message_lower in ['prev', 'назад', 'предыдущие']:
+            elif message_lower in _PREV_TOKENS:
                 session.pagination_offset = max(0, session.pagination_offset - 10)
-                ticket = self.ticket_repo.get(session.selected_ticket_id)
-                response = self._render_psychologists_page(ticket, psychologists, session.pagination_offset)
+                ticket = session._selected_ticket or self.ticket_repo.get(session.selected_ticket_id)
+                response = self._render_psychologists_page(ticket, psychologists, session.pagination_offset, workload)
                 return session, response
             
             else:
                 # Пытаемся выбрать психолога по номеру (1-10)
-                try:
-                    psy_num = int(message.strip())
+                if stripped.isdigit() and len(stripped) <= 2:
+                    psy_num = int(stripped)
                     if 1 <= psy_num <= 10:
                         idx = session.pagination_offset + psy_num - 1
                         if idx < len(psychologists):
@@ -407,19 +523,100 @@ class BotService:
                             
                             session.state = State.ADMIN_MENU
                             session.selected_ticket_id = None
+                            session._selected_ticket = None
                             session.pagination_offset = 0
                             return session, response
                         else:
                             response = "❌ Психолог не найден"
                             return session, response
-                except ValueError:
-                    pass
                 
                 response = "❌ Неверный ввод. Введите номер психолога (1-10) или команду (далее/назад/отмена)"
                 return session, response
         
         return session, "❌ Неизвестная команда"
 
+    def _admin_show_psychologists(self, session: UserSession) -> tuple:
+        """Админ-меню: показать управление психологами"""
+        session.state = State.ADMIN_MANAGE_PSYCHOLOGISTS
+        psychologists = self.role_manager.list_psychologists()
+        
+        if not psychologists:
+            response = "👥 *Управление психологами*\n\nПсихологи не назначены\n\n📍 *Действия:*\n1️⃣ Добавить психолога\n2️⃣ Вернуться в меню"
+        else:
+            lines = ["👥 *Управление психологами*\n\n*Текущие психологи:*\n"]
+            for psy in psychologists:
+                name = f"{psy.first_name or ''} {psy.last_name or ''}".strip()
+                username = f"@{psy.username}" if psy.username else ""
+                lines.append(f"\n• {psy.user_id} ({username or name or 'нет имени'})")
+            lines.append("\n\n📍 *Действия:*\n1️⃣ Добавить психолога\n2️⃣ Понизить психолога\n0️⃣ Вернуться в меню")
+            response = "".join(lines)
+        
+        return session, response
+
+    def _admin_show_recent_tickets(self, session: UserSession) -> tuple:
+        """Админ-меню: показать последние 10 заявок"""
+        tickets = self.ticket_repo.get_recent(10)
+        if not tickets:
+            response = "📋 Заявок нет"
+        else:
+            lines = ["📋 Все заявки:\n"]
+            for t in tickets:
+                severity_icon = _SEVERITY_ICONS.get(t.severity.value, "⚪")
+                
+                # Информация о психологе
+                if t.assigned_to:
+                    psychologist = self.role_manager.get_user(t.assigned_to)
+                    psy_name = f"@{psychologist.username}" if psychologist and psychologist.username else t.assigned_to
+                    psy_info = f" → {psy_name}"
+                else:
+                    psy_info = " (не назначен)"
+                
+                lines.append(f"\n{severity_icon} {t.id[:8]} - {t.topic} ({t.status.value}){psy_info}")
+            response = "".join(lines)
+        return session, response
+
+    def _admin_start_assignment(self, session: UserSession) -> tuple:
+        """Админ-меню: начать назначение заявки"""
+        tickets, total = self.get_top_tickets_for_assignment(10)
+        
+        if not tickets:
+            return session, "📋 Нет заявок для назначения"
+        
+        if not self.role_manager.list_psychologists():
+            return session, "❌ Нет назначенных психологов\n\nСначала добавьте психологов через пункт 1"
+        
+        # Показываем первую страницу заявок
+        session.state = State.ADMIN_ASSIGN_TICKET_SELECT
+        session.pagination_offset = 0
+        return session, self._render_tickets_page(tickets, session.pagination_offset, total)
+
+    def _admin_to_regular_menu(self, session: UserSession) -> tuple:
+        """Админ-меню: перейти в обычное меню"""
+        session.state = State.MENU
+        return session, "Перешли в обычное меню"
+
+    def _admin_back_to_panel(self, session: UserSession) -> tuple:
+        """Управление психологами: назад в админ-панель"""
+        session.state = State.ADMIN_MENU
+        return session, "Возврат в админ-панель"
+
+    def _admin_prompt_promote(self, session: UserSession) -> tuple:
+        """Управление психологами: запросить ID/username для повышения"""
+        session.state = State.ADMIN_PROMOTE_PSYCHO
+        return session, "Отправьте ID или @username пользователя для повышения:"
+
+    def _admin_start_demotion(self, session: UserSession) -> tuple:
+        """Управление психологами: показать психологов для понижения"""
+        psychologists = self.role_manager.list_psychologists()
+        
+        if not psychologists:
+            session.state = State.ADMIN_MENU
+            return session, "❌ Нет психологов для понижения"
+        
+        session.state = State.ADMIN_DEMOTE_PSYCHO_SELECT
+        session.pagination_offset = 0
+        return session, self._render_psychologists_for_demotion(psychologists, 0, self._count_active_workload())
+
     _PSY_MENU_TEXT = """🧑‍⚕️ *ПАНЕЛЬ ПСИХОЛОГА*
 
 Выберите действие:
@@ -431,132 +628,135 @@ class BotService:
 
     def _handle_psychologist_message(self, session: UserSession, message: str, user_id: str) -> tuple:
         """Обработка сообщений психолога"""
-        message_lower = message.strip().lower()
+        stripped = message.strip()
+        message_lower = stripped.casefold() if len(stripped) <= _MAX_TOKEN_LEN else ""
         
         # Если психолог в режиме чата — обрабатываем до глобальных команд
-        if session.state == State.PSY_TICKET_CHAT:
+        if session.state is State.PSY_TICKET_CHAT:
             return self._handle_psy_chat_message(session, message, message_lower, user_id)
         
         # /menu и /start всегда возвращают в панель психолога
-        if message_lower in ['/menu', 'menu', '/start', 'start'] or session.state == State.MENU:
+        if message_lower in _MENU_NAV_TOKENS or session.state is State.MENU:
             session.state = State.PSY_MENU
             return session, self._PSY_MENU_TEXT
         
-        elif session.state == State.PSY_MENU:
-            if message_lower in ['1', 'очередь заявок']:
-                tickets = [t for t in self.ticket_repo.get_all()
-                          if t.status in (TicketStatus.NEW, TicketStatus.WAITING_RESPONSE)]
-                
-                if not tickets:
+        elif session.state is State.PSY_MENU:
+            if message_lower in _PSY_QUEUE_TOKENS:
+                page, total = self.ticket_repo.list_page(0, 10, statuses=_QUEUE_STATUSES)
+
+                if not total:
                     session.state = State.PSY_MENU
                     return session, "✅ Нет заявок в очереди"
-                
+
                 session.state = State.PSY_TICKETS_LIST
                 session.pagination_offset = 0
-                return session, self._render_psy_queue_page(tickets, 0)
-            
-            elif message_lower in ['2', 'мои заявки']:
-                tickets = [t for t in self.ticket_repo.get_all()
-                          if t.assigned_to == user_id]
-                
-                if not tickets:
+                return session, self._render_psy_queue_page(page, 0, total)
+
+            elif message_lower in _PSY_MY_TICKETS_TOKENS:
+                page, total = self.ticket_repo.list_page(0, 10, assigned_to=user_id)
+
+                if not total:
                     return session, "📋 У вас нет заявок в работе"
-                
+
                 session.state = State.PSY_MY_TICKETS
                 session.pagination_offset = 0
-                return session, self._render_psy_my_tickets_page(tickets, 0)
-        
-        elif session.state == State.PSY_TICKETS_LIST:
-            tickets = [t for t in self.ticket_repo.get_all()
-                      if t.status in (TicketStatus.NEW, TicketStatus.WAITING_RESPONSE)]
-            
-            if message_lower in ['exit', 'отмена', '0']:
+                return session, self._render_psy_my_tickets_page(page, 0, total)
+
+        elif session.state is State.PSY_TICKETS_LIST:
+            # Страницы читаются через list_page: репозиторий отдаёт только
+            # текущие 10 строк и общее количество, без полного списка
+            if message_lower in _CANCEL_TOKENS:
                 session.state = State.PSY_MENU
                 return session, self._PSY_MENU_TEXT
-            
-            elif message_lower in ['next', 'далее', 'следующие']:
-                session.pagination_offset += 10
-                if session.pagination_offset >= len(tickets):
-                    session.pagination_offset -= 10
+
+            elif message_lower in _NEXT_TOKENS:
+                offset = session.pagination_offset + 10
+                page, total = self.ticket_repo.list_page(offset, 10, statuses=_QUEUE_STATUSES)
+                if offset >= total:
                     return session, "✅ Это последняя страница"
-                return session, self._render_psy_queue_page(tickets, session.pagination_offset)
-            
-            elif message_lower in ['prev', 'назад', 'предыдущие']:
+                session.pagination_offset = offset
+                return session, self._render_psy_queue_page(page, offset, total)
+
+            elif message_lower in _PREV_TOKENS:
                 session.pagination_offset = max(0, session.pagination_offset - 10)
-                return session, self._render_psy_queue_page(tickets, session.pagination_offset)
-            
+                page, total = self.ticket_repo.list_page(
+                    session.pagination_offset, 10, statuses=_QUEUE_STATUSES)
+                return session, self._render_psy_queue_page(page, session.pagination_offset, total)
+
             else:
-                try:
-                    ticket_num = int(message.strip())
+                if stripped.isdigit() and len(stripped) <= 2:
+                    ticket_num = int(stripped)
                     if 1 <= ticket_num <= 10:
-                        idx = session.pagination_offset + ticket_num - 1
-                        if idx < len(tickets):
-                            session.selected_ticket_id = tickets[idx].id
-                            session.state = State.PSY_TICKET_OPEN
-                            return session, self._render_psy_ticket_card(tickets[idx], user_id)
+                        page, _ = self.ticket_repo.list_page(
+                            session.pagination_offset, 10, statuses=_QUEUE_STATUSES)
+                        if ticket_num <= len(page):
+                            # Строка страницы — проекция; карточке нужен полный объект
+                            ticket = self.ticket_repo.get(page[ticket_num - 1].id)
+                            if ticket:
+                                session.selected_ticket_id = ticket.id
+                                session.state = State.PSY_TICKET_OPEN
+                                return session, self._render_psy_ticket_card(ticket, user_id)
                         return session, "❌ Заявка не найдена"
-                except ValueError:
-                    pass
                 return session, "❌ Введите номер заявки (1-10) или команду (далее/назад/отмена)"
-        
-        elif session.state == State.PSY_MY_TICKETS:
-            tickets = [t for t in self.ticket_repo.get_all()
-                      if t.assigned_to == user_id]
-            
-            if message_lower in ['exit', 'отмена', '0']:
+
+        elif session.state is State.PSY_MY_TICKETS:
+            if message_lower in _CANCEL_TOKENS:
                 session.state = State.PSY_MENU
                 return session, self._PSY_MENU_TEXT
-            
-            elif message_lower in ['next', 'далее', 'следующие']:
-                session.pagination_offset += 10
-                if session.pagination_offset >= len(tickets):
-                    session.pagination_offset -= 10
+
+            elif message_lower in _NEXT_TOKENS:
+                offset = session.pagination_offset + 10
+                page, total = self.ticket_repo.list_page(offset, 10, assigned_to=user_id)
+                if offset >= total:
                     return session, "✅ Это последняя страница"
-                return session, self._render_psy_my_tickets_page(tickets, session.pagination_offset)
-            
-            elif message_lower in ['prev', 'назад', 'предыдущие']:
+                session.pagination_offset = offset
+                return session, self._render_psy_my_tickets_page(page, offset, total)
+
+            elif message_lower in _PREV_TOKENS:
                 session.pagination_offset = max(0, session.pagination_offset - 10)
-                return session, self._render_psy_my_tickets_page(tickets, session.pagination_offset)
-            
+                page, total = self.ticket_repo.list_page(
+                    session.pagination_offset, 10, assigned_to=user_id)
+                return session, self._render_psy_my_tickets_page(page, session.pagination_offset, total)
+
             else:
-                try:
-                    ticket_num = int(message.strip())
+                if stripped.isdigit() and len(stripped) <= 2:
+                    ticket_num = int(stripped)
                     if 1 <= ticket_num <= 10:
-                        idx = session.pagination_offset + ticket_num - 1
-                        if idx < len(tickets):
-                            session.selected_ticket_id = tickets[idx].id
-                            session.state = State.PSY_TICKET_OPEN
-                            return session, self._render_psy_ticket_card(tickets[idx], user_id)
+                        page, _ = self.ticket_repo.list_page(
+                            session.pagination_offset, 10, assigned_to=user_id)
+                        if ticket_num <= len(page):
+                            ticket = self.ticket_repo.get(page[ticket_num - 1].id)
+                            if ticket:
+                                session.selected_ticket_id = ticket.id
+                                session.state = State.PSY_TICKET_OPEN
+                                return session, self._render_psy_ticket_card(ticket, user_id)
                         return session, "❌ Заявка не найдена"
-                except ValueError:
-                    pass
                 return session, "❌ Введите номер заявки (1-10) или команду (далее/назад/отмена)"
         
-        elif session.state == State.PSY_TICKET_OPEN:
+        elif session.state is State.PSY_TICKET_OPEN:
             ticket = self.ticket_repo.get(session.selected_ticket_id) if session.selected_ticket_id else None
             
-            if message_lower in ['0', 'назад', 'назад к списку']:
+            if message_lower in _PSY_BACK_TO_LIST_TOKENS:
                 # Возвращаемся в тот список, откуда пришли
                 if ticket and ticket.assigned_to == user_id:
-                    my_tickets = [t for t in self.ticket_repo.get_all() if t.assigned_to == user_id]
-                    if my_tickets:
+                    page, total = self.ticket_repo.list_page(0, 10, assigned_to=user_id)
+                    if total:
                         session.state = State.PSY_MY_TICKETS
                         session.pagination_offset = 0
                         session.selected_ticket_id = None
-                        return session, self._render_psy_my_tickets_page(my_tickets, 0)
+                        return session, self._render_psy_my_tickets_page(page, 0, total)
                 # По умолчанию — в очередь
-                queue = [t for t in self.ticket_repo.get_all()
-                         if t.status in (TicketStatus.NEW, TicketStatus.WAITING_RESPONSE)]
-                if queue:
+                page, total = self.ticket_repo.list_page(0, 10, statuses=_QUEUE_STATUSES)
+                if total:
                     session.state = State.PSY_TICKETS_LIST
                     session.pagination_offset = 0
                     session.selected_ticket_id = None
-                    return session, self._render_psy_queue_page(queue, 0)
+                    return session, self._render_psy_queue_page(page, 0, total)
                 session.state = State.PSY_MENU
                 session.selected_ticket_id = None
                 return session, self._PSY_MENU_TEXT
             
-            elif message_lower in ['1', 'взять в работу'] and ticket and ticket.assigned_to != user_id:
+            elif message_lower in _PSY_TAKE_TOKENS and ticket and ticket.assigned_to != user_id:
                 success = self.assign_ticket(session.selected_ticket_id, user_id)
                 if success:
                     session.state = State.PSY_MENU
@@ -564,28 +764,30 @@ class BotService:
                     return session, f"✅ Заявка взята в работу"
                 return session, "❌ Ошибка при назначении заявки"
             
-            elif message_lower in ['1', 'изменить статус'] and ticket and ticket.assigned_to == user_id:
+            elif message_lower in _PSY_STATUS_TOKENS and ticket and ticket.assigned_to == user_id:
                 session.state = State.PSY_CHANGE_STATUS
-                response = f"📌 *Заявка {ticket.id[:8]}*\n"
-                response += f"Текущий статус: {ticket.status.value}\n\n"
-                response += "*Выберите новый статус:*\n"
-                response += "1️⃣ В работе\n"
-                response += "2️⃣ Ожидание ответа\n"
-                response += "3️⃣ Закрыто\n"
-                response += "0️⃣ Отмена"
+                response = (
+                    f"📌 *Заявка {ticket.id[:8]}*\n"
+                    f"Текущий статус: {ticket.status.value}\n\n"
+                    "*Выберите новый статус:*\n"
+                    "1️⃣ В работе\n"
+                    "2️⃣ Ожидание ответа\n"
+                    "3️⃣ Закрыто\n"
+                    "0️⃣ Отмена"
+                )
                 return session, response
             
-            elif message_lower in ['2', 'начать чат', 'закрыть чат'] and ticket and ticket.assigned_to == user_id:
+            elif message_lower in _PSY_CHAT_TOGGLE_TOKENS and ticket and ticket.assigned_to == user_id:
                 # Проверяем, есть ли активный чат
-                client_session = self.session_repo.get(ticket.user_id)
-                chat_active = (client_session and client_session.state == State.USER_IN_CHAT 
+                client_session = self._get_session(ticket.user_id)
+                chat_active = (client_session and client_session.state is State.USER_IN_CHAT 
                               and client_session.active_chat_ticket_id == ticket.id)
                 
-                if chat_active and message_lower in ['2', 'закрыть чат']:
+                if chat_active and message_lower in _PSY_CHAT_CLOSE_TOKENS:
                     # Закрываем чат
                     client_session.state = State.MENU
                     client_session.active_chat_ticket_id = None
-                    self.session_repo.save(client_session)
+                    self._save_session(client_session)
                     
                     self.pending_notifications.append((
                         ticket.user_id,
@@ -595,7 +797,7 @@ class BotService:
                     session.active_chat_ticket_id = None
                     return session, self._render_psy_ticket_card(ticket, user_id)
                 
-                elif not chat_active and message_lower in ['2', 'начать чат']:
+                elif not chat_active and message_lower in _PSY_CHAT_OPEN_TOKENS:
                     # Начинаем чат — переводим психолога в режим чата
                     session.state = State.PSY_TICKET_CHAT
                     session.active_chat_ticket_id = ticket.id
@@ -606,7 +808,7 @@ class BotService:
                     else:
                         client_session.state = State.USER_IN_CHAT
                     client_session.active_chat_ticket_id = ticket.id
-                    self.session_repo.save(client_session)
+                    self._save_session(client_session)
                     
                     # Уведомление пользователю
                     self.pending_notifications.append((
@@ -624,10 +826,10 @@ class BotService:
                     return session, "❌ Введите номер действия (1-2) или 0 (Назад к списку)"
                 return session, "❌ Введите 1 (Взять в работу) или 0 (Назад к списку)"
         
-        elif session.state == State.PSY_CHANGE_STATUS:
+        elif session.state is State.PSY_CHANGE_STATUS:
             ticket = self.ticket_repo.get(session.selected_ticket_id) if session.selected_ticket_id else None
             
-            if message_lower in ['0', 'отмена']:
+            if message_lower in _BACK_CANCEL_TOKENS:
                 if ticket:
                     session.state = State.PSY_TICKET_OPEN
                     response = self._render_psy_ticket_card(ticket, user_id)
@@ -653,7 +855,7 @@ class BotService:
             
             return session, "❌ Введите номер статуса (1-3) или 0 (Отмена)"
         
-        elif session.state == State.PSY_TICKET_CHAT:
+        elif session.state is State.PSY_TICKET_CHAT:
             # Этот блок не должен вызываться — обработка вынесена выше
             return self._handle_psy_chat_message(session, message, message_lower, user_id)
         
@@ -665,14 +867,14 @@ class BotService:
         ticket_id = session.active_chat_ticket_id or session.selected_ticket_id
         ticket = self.ticket_repo.get(ticket_id) if ticket_id else None
 
-        if message_lower in ['/end', 'end', '/закрыть чат', 'закрыть чат']:
+        if message_lower in _END_CHAT_TOKENS:
             # Завершаем чат со стороны психолога
             if ticket:
-                client_session = self.session_repo.get(ticket.user_id)
-                if client_session and client_session.state == State.USER_IN_CHAT and client_session.active_chat_ticket_id == ticket.id:
+                client_session = self._get_session(ticket.user_id)
+                if client_session and client_session.state is State.USER_IN_CHAT and client_session.active_chat_ticket_id == ticket.id:
                     client_session.state = State.MENU
                     client_session.active_chat_ticket_id = None
-                    self.session_repo.save(client_session)
+                    self._save_session(client_session)
 
                     self.pending_notifications.append((
                         ticket.user_id,
@@ -685,14 +887,14 @@ class BotService:
                 return session, f"💬 *Чат завершён*\n\n" + self._render_psy_ticket_card(ticket, user_id)
             return session, "💬 *Чат завершён*"
 
-        elif message_lower in ['/menu', 'menu', '/start', 'start']:
+        elif message_lower in _MENU_NAV_TOKENS:
             # /menu и /start тоже завершают чат и возвращают в меню психолога
             if ticket:
-                client_session = self.session_repo.get(ticket.user_id)
-                if client_session and client_session.state == State.USER_IN_CHAT and client_session.active_chat_ticket_id == ticket.id:
+                client_session = self._get_session(ticket.user_id)
+                if client_session and client_session.state is State.USER_IN_CHAT and client_session.active_chat_ticket_id == ticket.id:
                     client_session.state = State.MENU
                     client_session.active_chat_ticket_id = None
-                    self.session_repo.save(client_session)
+                    self._save_session(client_session)
 
                     self.pending_notifications.append((
                         ticket.user_id,
@@ -717,20 +919,21 @@ class BotService:
 
     def _handle_user_in_chat(self, session: UserSession, message: str) -> tuple:
         """Обработка сообщений пользователя в режиме чата с психологом"""
-        message_lower = message.strip().lower()
+        stripped = message.strip()
+        message_lower = stripped.casefold() if len(stripped) <= _MAX_TOKEN_LEN else ""
         
         ticket = self.ticket_repo.get(session.active_chat_ticket_id) if session.active_chat_ticket_id else None
         
-        if message_lower in ['/end', 'end', '/menu', 'menu']:
+        if message_lower in _USER_CHAT_EXIT_TOKENS:
             # Пользователь выходит из чата
             psy_id = ticket.assigned_to if ticket else None
             
             if psy_id:
-                psy_session = self.session_repo.get(psy_id)
-                if psy_session and psy_session.state == State.PSY_TICKET_CHAT and psy_session.active_chat_ticket_id == session.active_chat_ticket_id:
+                psy_session = self._get_session(psy_id)
+                if psy_session and psy_session.state is State.PSY_TICKET_CHAT and psy_session.active_chat_ticket_id == session.active_chat_ticket_id:
                     psy_session.state = State.PSY_TICKET_OPEN
                     psy_session.active_chat_ticket_id = None
-                    self.session_repo.save(psy_session)
+                    self._save_session(psy_session)
                 
                 self.pending_notifications.append((
                     psy_id,
@@ -766,7 +969,7 @@ class BotService:
         form = session.consultation_form
         
         ticket = Ticket(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             user_id=session.user_id,
             topic=form.topic,
             gender=form.gender,
@@ -777,6 +980,7 @@ class BotService:
             created_at=datetime.now()
         )
         
+        self._tickets_version += 1
         return self.ticket_repo.create(ticket)
 
     def get_user_tickets(self, user_id: str) -> list[Ticket]:
@@ -793,6 +997,7 @@ class BotService:
         if ticket:
             ticket.status = status
             self.ticket_repo.update(ticket)
+            self._tickets_version += 1
             return True
         return False
 
@@ -803,6 +1008,7 @@ class BotService:
             ticket.assigned_to = specialist_id
             ticket.status = TicketStatus.IN_PROGRESS
             self.ticket_repo.update(ticket)
+            self._tickets_version += 1
             return True
         return False
 
@@ -811,11 +1017,18 @@ class BotService:
         return self.ticket_repo.get_all()
 
     def add_message_to_ticket(self, ticket_id: str, user_id: str, message: str) -> bool:
-        """Добавление сообщения в чат заявки"""
+        """Добавление сообщения в чат заявки
+
+        Запись вида {"ts": int-миллисекунды, "user_id", "message"}.
+        Исторические записи несут {"timestamp": isoformat-строка} —
+        читающий историю код должен принимать оба ключа.
+        """
         ticket = self.ticket_repo.get(ticket_id)
         if ticket:
+            # int-миллисекунды вместо isoformat: без сборки строки на
+            # каждое сообщение; форматирование — забота показа
             ticket.chat_history.append({
-                "timestamp": datetime.now().isoformat(),
+                "ts": int(time.time() * 1000),
                 "user_id": user_id,
                 "message": message
             })
@@ -834,47 +1047,62 @@ class BotService:
     def promote_to_psychologist(self, user_id: str) -> bool:
         """Повысить до психолога"""
         success = self.role_manager.promote_to_psychologist(user_id)
-        if success and self.role_repo:
+        if success:
             updated_profile = self.role_manager.get_user(user_id)
             if updated_profile:
-                self.role_repo.save_user(updated_profile)
+                self._persist_profile(updated_profile)
         return success
 
     def demote_psychologist(self, user_id: str) -> bool:
         """Понизить психолога"""
         success = self.role_manager.demote_psychologist(user_id)
-        if success and self.role_repo:
+        if success:
             updated_profile = self.role_manager.get_user(user_id)
             if updated_profile:
-                self.role_repo.save_user(updated_profile)
+                self._persist_profile(updated_profile)
         return success
 
     def get_sorted_tickets_for_assignment(self) -> list[Ticket]:
-        """Получить заявки для назначения, отсортированные по критичности и дате"""
-        severity_order = {"Критическая": 0, "Высокая": 1, "Средняя": 2, "Низкая": 3}
-        
-        tickets = [t for t in self.ticket_repo.get_all() 
-                  if t.status in (TicketStatus.NEW, TicketStatus.WAITING_RESPONSE)]
-        
+        """Получить заявки для назначения, отсортированные по критичности и дате
+
+        Результат кэшируется до первой мутации заявок (_tickets_version),
+        поэтому листание страниц не пересортировывает очередь.
+        """
+        cached = self._cached_assign_list
+        if cached is not None and cached[0] == self._tickets_version:
+            return cached[1]
+
+        tickets = self.ticket_repo.get_by_status_in(_QUEUE_STATUSES)
         # Сортировка: критичность (убывающая), затем дата (возрастающая)
-        tickets.sort(key=lambda t: (
-            severity_order.get(t.severity.value, 999),
-            t.created_at
-        ))
+        tickets.sort(key=_assignment_sort_key)
+        self._cached_assign_list = (self._tickets_version, tickets)
         return tickets
 
-    def get_psychologists_by_workload(self) -> list[UserProfile]:
-        """Получить психологов, отсортированных по количеству активных заявок"""
-        psychologists = self.role_manager.list_psychologists()
-        
-        # Подсчитаем активные заявки каждого психолога
-        active_statuses = (TicketStatus.NEW, TicketStatus.IN_PROGRESS, TicketStatus.WAITING_RESPONSE)
-        workload = {}
-        
-        for psy in psychologists:
-            count = len([t for t in self.ticket_repo.get_all() 
-                        if t.assigned_to == psy.user_id and t.status in active_statuses])
-            workload[psy.user_id] = count
+    def get_top_tickets_for_assignment(self, limit: int) -> tuple[list[Ticket], int]:
+        """Получить первые limit заявок для назначения и общее их количество
+
+        Делегирует get_sorted_tickets_for_assignment: первый вызов сортирует
+        очередь и кладёт её в кэш, дальнейшее листание страниц — срез кэша
+        без обращения к репозиторию.
+        """
+        tickets = self.get_sorted_tickets_for_assignment()
+        return tickets[:limit], len(tickets)
+
+    def _count_active_workload(self) -> dict:
+        """Активные заявки по назначенным психологам (агрегирует репозиторий)"""
+        return self.ticket_repo.count_active_by_assignee(_ACTIVE_STATUSES)
+
+    def get_psychologists_by_workload(self, workload: Optional[dict] = None,
+                                      psychologists: Optional[list[UserProfile]] = None) -> list[UserProfile]:
+        """Получить психологов, отсортированных по количеству активных заявок
+
+        workload и psychologists позволяют переиспользовать уже полученные
+        в рамках текущего сообщения данные вместо повторного запроса.
+        """
+        if psychologists is None:
+            psychologists = self.role_manager.list_psychologists()
+        if workload is None:
+            workload = self._count_active_workload()
         
         # Сортируем по количеству активных заявок (меньше - лучше)
         psychologists.sort(key=lambda p: workload.get(p.user_id, 0))
@@ -882,163 +1110,172 @@ class BotService:
 
     def _render_psy_ticket_card(self, ticket: Ticket, user_id: str) -> str:
         """Рендеринг карточки заявки для психолога"""
-        response = f"📌 *Заявка {ticket.id[:8]}*\n\n"
-        response += f"Тема: {ticket.topic}\n"
-        response += f"Критичность: {ticket.severity.value}\n"
-        response += f"Статус: {ticket.status.value}\n"
-        response += f"От: {ticket.user_id}\n"
-        response += f"\n💬 {ticket.message}\n" if ticket.message else ""
-        response += "\n*Действия:*\n"
+        parts = [
+            f"📌 *Заявка {ticket.id[:8]}*\n\n",
+            f"Тема: {ticket.topic}\n",
+            f"Критичность: {ticket.severity.value}\n",
+            f"Статус: {ticket.status.value}\n",
+            f"От: {ticket.user_id}\n",
+        ]
+        if ticket.message:
+            parts.append(f"\n💬 {ticket.message}\n")
+        parts.append("\n*Действия:*\n")
         if ticket.assigned_to == user_id:
-            response += "1️⃣ Изменить статус\n"
+            parts.append("1️⃣ Изменить статус\n")
             # Проверяем, есть ли активный чат
-            user_session = self.session_repo.get(ticket.user_id)
-            if user_session and user_session.state == State.USER_IN_CHAT and user_session.active_chat_ticket_id == ticket.id:
-                response += "2️⃣ Закрыть чат\n"
+            user_session = self._get_session(ticket.user_id)
+            if user_session and user_session.state is State.USER_IN_CHAT and user_session.active_chat_ticket_id == ticket.id:
+                parts.append("2️⃣ Закрыть чат\n")
             else:
-                response += "2️⃣ Начать чат\n"
+                parts.append("2️⃣ Начать чат\n")
         else:
-            response += "1️⃣ Взять в работу\n"
-        response += "0️⃣ Назад к списку"
-        return response
+            parts.append("1️⃣ Взять в работу\n")
+        parts.append("0️⃣ Назад к списку")
+        return "".join(parts)
 
-    def _render_psy_queue_page(self, tickets: list[Ticket], offset: int) -> str:
-        """Рендеринг страницы очереди заявок для психолога"""
-        page_tickets = tickets[offset:offset+10]
-        total = len(tickets)
+    def _render_psy_queue_page(self, page_tickets: list, offset: int, total: int) -> str:
+        """Рендеринг страницы очереди заявок для психолога
+
+        page_tickets — уже отрезанная репозиторием страница (Ticket или
+        LazyTicket из list_page), total — общее число заявок очереди.
+        """
         page_num = (offset // 10) + 1
         max_pages = (total + 9) // 10
-        
-        response = f"📋 *Очередь заявок (стр. {page_num}/{max_pages})*\n"
-        response += f"_Всего: {total}_\n\n"
-        
+
+        parts = [
+            f"📋 *Очередь заявок (стр. {page_num}/{max_pages})*\n",
+            f"_Всего: {total}_\n\n",
+        ]
         for i, ticket in enumerate(page_tickets, 1):
-            topic = ticket.topic[:30] + "..." if len(ticket.topic) > 30 else ticket.topic
-            date_str = ticket.created_at.strftime("%d.%m")
-            response += f"{i}. {topic} ({ticket.severity.value}) - {date_str}\n"
-            response += f"   От: {ticket.user_id}\n"
+            parts.append(f"{i}. {ticket.display_line()}\n")
+            parts.append(f"   От: {ticket.user_id}\n")
         
-        response += "\n📍 *Команды:*\n"
-        response += "Введите номер заявки (1-10)\n"
+        parts.append("\n📍 *Команды:*\n")
+        parts.append("Введите номер заявки (1-10)\n")
         if offset > 0:
-            response += "Типовые: `далее` `назад` `отмена`"
+            parts.append("Типовые: `далее` `назад` `отмена`")
         else:
-            response += "Типовые: `далее` `отмена`"
+            parts.append("Типовые: `далее` `отмена`")
         
-        return response
+        return "".join(parts)
 
-    def _render_psy_my_tickets_page(self, tickets: list[Ticket], offset: int) -> str:
-        """Рендеринг страницы 'Мои заявки' для психолога"""
-        page_tickets = tickets[offset:offset+10]
-        total = len(tickets)
+    def _render_psy_my_tickets_page(self, page_tickets: list, offset: int, total: int) -> str:
+        """Рендеринг страницы 'Мои заявки' для психолога
+
+        page_tickets — уже отрезанная репозиторием страница (Ticket или
+        LazyTicket из list_page), total — общее число заявок психолога.
+        """
         page_num = (offset // 10) + 1
         max_pages = (total + 9) // 10
-        
-        response = f"📋 *Мои заявки (стр. {page_num}/{max_pages})*\n"
-        response += f"_Всего: {total}_\n\n"
-        
+
+        parts = [
+            f"📋 *Мои заявки (стр. {page_num}/{max_pages})*\n",
+            f"_Всего: {total}_\n\n",
+        ]
         for i, ticket in enumerate(page_tickets, 1):
             topic = ticket.topic[:30] + "..." if len(ticket.topic) > 30 else ticket.topic
-            response += f"{i}. {topic} ({ticket.status.value})\n"
+            parts.append(f"{i}. {topic} ({ticket.status.value})\n")
         
-        response += "\n📍 *Команды:*\n"
-        response += "Введите номер заявки (1-10)\n"
+        parts.append("\n📍 *Команды:*\n")
+        parts.append("Введите номер заявки (1-10)\n")
         if offset > 0:
-            response += "Типовые: `далее` `назад` `отмена`"
+            parts.append("Типовые: `далее` `назад` `отмена`")
         else:
-            response += "Типовые: `далее` `отмена`"
+            parts.append("Типовые: `далее` `отмена`")
         
-        return response
+        return "".join(parts)
+
+    def _render_tickets_page(self, tickets: list[Ticket], offset: int,
+                             total: Optional[int] = None) -> str:
+        """Рендеринг страницы заявок для выбора
 
-    def _render_tickets_page(self, tickets: list[Ticket], offset: int) -> str:
-        """Рендеринг страницы заявок для выбора"""
+        total — общее число заявок, если tickets содержит лишь верхушку списка.
+        """
         page_tickets = tickets[offset:offset+10]
-        total = len(tickets)
+        if total is None:
+            total = len(tickets)
         page_num = (offset // 10) + 1
         max_pages = (total + 9) // 10
         
-        response = f"📋 *Заявки для назначения (стр. {page_num}/{max_pages})*\n"
-        response += f"_Всего: {total}_\n\n"
+        parts = [
+            f"📋 *Заявки для назначения (стр. {page_num}/{max_pages})*\n",
+            f"_Всего: {total}_\n\n",
+        ]
         
         for i, ticket in enumerate(page_tickets, 1):
-            topic = ticket.topic[:30] + "..." if len(ticket.topic) > 30 else ticket.topic
-            date_str = ticket.created_at.strftime("%d.%m")
-            response += f"{i}. {topic} ({ticket.severity.value}) - {date_str}\n"
+            parts.append(f"{i}. {ticket.display_line()}\n")
         
-        response += "\n📍 *Команды:*\n"
-        response += "Введите номер заявки (1-10)\n"
+        parts.append("\n📍 *Команды:*\n")
+        parts.append("Введите номер заявки (1-10)\n")
         if offset > 0:
-            response += "Типовые: `далее` `назад` `отмена`"
+            parts.append("Типовые: `далее` `назад` `отмена`")
         else:
-            response += "Типовые: `далее` `отмена`"
+            parts.append("Типовые: `далее` `отмена`")
         
-        return response
+        return "".join(parts)
 
-    def _render_psychologists_page(self, ticket: Ticket, psychologists: list[UserProfile], offset: int) -> str:
+    def _render_psychologists_page(self, ticket: Ticket, psychologists: list[UserProfile], offset: int,
+                                   workload: Optional[dict] = None) -> str:
         """Рендеринг страницы психологов для выбора"""
-        active_statuses = (TicketStatus.NEW, TicketStatus.IN_PROGRESS, TicketStatus.WAITING_RESPONSE)
-        workload = {}
-        for psy in psychologists:
-            count = len([t for t in self.ticket_repo.get_all() 
-                        if t.assigned_to == psy.user_id and t.status in active_statuses])
-            workload[psy.user_id] = count
+        if workload is None:
+            workload = self._count_active_workload()
         
         page_psychologists = psychologists[offset:offset+10]
         total = len(psychologists)
         page_num = (offset // 10) + 1
         max_pages = (total + 9) // 10
         
-        response = f"👥 *Выберите психолога (стр. {page_num}/{max_pages})*\n\n"
-        response += f"📌 *Заявка:* {ticket.topic}\n"
-        response += f"   *Критичность:* {ticket.severity.value}\n\n"
-        
-        response += "*Психологи:*\n"
+        parts = [
+            f"👥 *Выберите психолога (стр. {page_num}/{max_pages})*\n\n",
+            f"📌 *Заявка:* {ticket.topic}\n",
+            f"   *Критичность:* {ticket.severity.value}\n\n",
+            "*Психологи:*\n",
+        ]
         for i, psy in enumerate(page_psychologists, 1):
             name_display = f"@{psy.username}" if psy.username else psy.user_id
             load = workload.get(psy.user_id, 0)
-            response += f"{i}. {name_display} ({load} активных)\n"
+            parts.append(f"{i}. {name_display} ({load} активных)\n")
         
-        response += "\n📍 *Команды:*\n"
-        response += "Введите номер психолога (1-10)\n"
+        parts.append("\n📍 *Команды:*\n")
+        parts.append("Введите номер психолога (1-10)\n")
         if offset > 0:
-            response += "Типовые: `далее` `назад` `отмена`"
+            parts.append("Типовые: `далее` `назад` `отмена`")
         else:
-            response += "Типовые: `далее` `отмена`"
+            parts.append("Типовые: `далее` `отмена`")
         
-        return response
+        return "".join(parts)
 
-    def _render_psychologists_for_demotion(self, psychologists: list[UserProfile], offset: int) -> str:
+    def _render_psychologists_for_demotion(self, psychologists: list[UserProfile], offset: int,
+                                           workload: Optional[dict] = None) -> str:
         """Рендеринг страницы психологов для понижения роли"""
-        active_statuses = (TicketStatus.NEW, TicketStatus.IN_PROGRESS, TicketStatus.WAITING_RESPONSE)
-        workload = {}
-        for psy in psychologists:
-            count = len([t for t in self.ticket_repo.get_all() 
-                        if t.assigned_to == psy.user_id and t.status in active_statuses])
-            workload[psy.user_id] = count
+        if workload is None:
+            workload = self._count_active_workload()
         
         page_psychologists = psychologists[offset:offset+10]
         total = len(psychologists)
         page_num = (offset // 10) + 1
         max_pages = (total + 9) // 10
         
-        response = f"⬇️ *Понижение психолога (стр. {page_num}/{max_pages})*\n\n"
-        response += "*Психологи:*\n"
+        parts = [
+            f"⬇️ *Понижение психолога (стр. {page_num}/{max_pages})*\n\n",
+            "*Психологи:*\n",
+        ]
         for i, psy in enumerate(page_psychologists, 1):
             name_display = f"@{psy.username}" if psy.username else psy.user_id
             full_name = f"{psy.first_name or ''} {psy.last_name or ''}".strip()
             load = workload.get(psy.user_id, 0)
             
-            response += f"{i}. {name_display}"
+            parts.append(f"{i}. {name_display}")
             if full_name:
-                response += f" ({full_name})"
-            response += f" - {load} активных заявок\n"
+                parts.append(f" ({full_name})")
+            parts.append(f" - {load} активных заявок\n")
         
-        response += "\n📍 *Команды:*\n"
-        response += "Введите номер психолога (1-10) для понижения\n"
+        parts.append("\n📍 *Команды:*\n")
+        parts.append("Введите номер психолога (1-10) для понижения\n")
         if offset > 0:
-            response += "Типовые: `далее` `назад` `отмена`"
+            parts.append("Типовые: `далее` `назад` `отмена`")
         else:
-            response += "Типовые: `далее` `отмена`"
+            parts.append("Типовые: `далее` `отмена`")
         
-        return response
+        return "".join(parts)
 
@@ -1,10 +1,36 @@
 from typing import Tuple
 from domain.models import State, UserSession, Severity
-from application.ai_service import generate_ai_reply, clear_user_memory, clear_user_rate_state
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Глобальные команды: frozenset с O(1) проверкой вместо списков,
+# пересобираемых при каждом вызове process()
+_MENU_CMDS = frozenset({'/menu', 'menu'})
+_CLEAR_CMDS = frozenset({'/clear', 'clear'})
+_START_CMDS = frozenset({'/start', 'start'})
+
+# Жёсткие лимиты на пользовательский ввод, попадающий в сессию: без них
+# один шумный клиент может раздуть session-объекты (и их сериализацию
+# в репозитории) до мегабайтов
+_MAX_TOPIC_LEN = 4096
+_MAX_MESSAGE_LEN = 16384
+_MAX_AI_MSG_LEN = 8192
+
+# Таблица критичности: собирается один раз при импорте, а не на каждый ввод
+_SEVERITY_MAP = {
+    '1': Severity.LOW,
+    'низкая': Severity.LOW,
+    '2': Severity.MEDIUM,
+    'средняя': Severity.MEDIUM,
+    '3': Severity.HIGH,
+    'высокая': Severity.HIGH,
+    '4': Severity.CRITICAL,
+    'критическая': Severity.CRITICAL,
+}
+assert all(t == t.casefold() for table in (_MENU_CMDS, _CLEAR_CMDS, _START_CMDS, _SEVERITY_MAP)
+           for t in table), "командные токены должны быть в casefold-форме"
+
 
 class StateMachine:
     """State Machine для управления состояниями пользователя"""
@@ -56,18 +82,36 @@ class StateMachine:
 Для возврата в меню используйте /menu
 """
 
+    # Составные ответы, собираемые из статических частей, — склеены один
+    # раз при загрузке класса, а не на каждое сообщение
+    START_TEXT = WELCOME_TEXT + MENU_TEXT
+    CONTEXT_CLEARED_TEXT = "🗑️ Контекст диалога очищен.\n\n" + AI_CHAT_TEXT
+    TICKET_CREATED_TEXT = (
+        "✅ Заявка создана! Специалист свяжется с вами в ближайшее время.\n\n"
+        + MENU_TEXT
+    )
+    PSY_QUESTION_REPLY_TAIL = (
+        "Спасибо за вопрос! Специалист ответит на него в ближайшее время.\n\n"
+        + MENU_TEXT
+    )
+
     def __init__(self):
-        self.handlers = {
-            State.MENU: self._handle_menu,
-            State.CONSULT_FORM_TOPIC: self._handle_topic,
-            State.CONSULT_FORM_GENDER: self._handle_gender,
-            State.CONSULT_FORM_AGE: self._handle_age,
-            State.CONSULT_FORM_SEVERITY: self._handle_severity,
-            State.CONSULT_FORM_MESSAGE: self._handle_message,
-            State.AI_CHAT: self._handle_ai_chat,
-            State.TERMS: self._handle_terms,
-            State.PSY_QUESTION: self._handle_psy_question,
-        }
+        # Таблица главного меню: токен -> (состояние, ответ), один
+        # словарный lookup вместо цепочки elif
+        self._menu_choices = {}
+        for tokens, state, response in (
+            (('1', 'консультация со специалистом'), State.CONSULT_FORM_TOPIC,
+             "📝 Консультация со специалистом\n\nУкажите тему консультации:"),
+            (('2', 'консультация с ии'), State.AI_CHAT, self.AI_CHAT_TEXT),
+            (('3', 'условия обращения'), State.TERMS, self.TERMS_TEXT),
+            (('4', 'вопрос по психологии'), State.PSY_QUESTION, self.PSY_QUESTION_TEXT),
+        ):
+            for token in tokens:
+                self._menu_choices[token] = (state, response)
+        # Инвариант: вход сравнивается с таблицами после casefold, токен
+        # не в casefold-форме молча перестал бы совпадать
+        assert all(t == t.casefold() for t in self._menu_choices), \
+            "токены меню должны быть в casefold-форме"
 
     def process(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
         """
@@ -76,64 +120,57 @@ class StateMachine:
         Returns:
             Tuple[UserSession, str]: Обновленная сессия и ответ бота
         """
+        # Нормализуем один раз; casefold корректнее lower для кириллицы
+        msg = message.strip().casefold()
+
         # Глобальные команды
-        if message.strip().lower() in ['/menu', 'menu']:
+        if msg in _MENU_CMDS:
             session.go_to_menu()
             return session, self.MENU_TEXT
 
-        if message.strip().lower() in ['/clear', 'clear'] and session.state == State.AI_CHAT:
+        if msg in _CLEAR_CMDS and session.state is State.AI_CHAT:
+            # Ленивый импорт: ai_service тянет httpx и разбор env,
+            # не нужные сценариям без ИИ (demo.py, CLI-утилиты)
+            from application.ai_service import clear_user_memory, clear_user_rate_state
+
             session.clear_ai_context()
             clear_user_memory(session.user_id)
             clear_user_rate_state(session.user_id)
-            return session, "🗑️ Контекст диалога очищен.\n\n" + self.AI_CHAT_TEXT
+            return session, self.CONTEXT_CLEARED_TEXT
 
         # Приветствие при старте
-        if message.strip().lower() in ['/start', 'start'] and session.state == State.MENU:
-            return session, self.WELCOME_TEXT + self.MENU_TEXT
+        if msg in _START_CMDS and session.state is State.MENU:
+            return session, self.START_TEXT
 
         # Обработка по текущему состоянию
-        handler = self.handlers.get(session.state)
+        handler = self._HANDLERS.get(session.state)
         if handler:
-            return handler(session, message)
+            return handler(self, session, message, msg)
         
         return session, "Неизвестная команда. Используйте /menu для возврата в главное меню."
 
-    def _handle_menu(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_menu(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка главного меню"""
-        message_lower = message.strip().lower()
-        
-        if message_lower in ['1', 'консультация со специалистом']:
-            session.state = State.CONSULT_FORM_TOPIC
-            return session, "📝 Консультация со специалистом\n\nУкажите тему консультации:"
-        
-        elif message_lower in ['2', 'консультация с ии', 'консультация с ии']:
-            session.state = State.AI_CHAT
-            return session, self.AI_CHAT_TEXT
-        
-        elif message_lower in ['3', 'условия обращения']:
-            session.state = State.TERMS
-            return session, self.TERMS_TEXT
-        
-        elif message_lower in ['4', 'вопрос по психологии']:
-            session.state = State.PSY_QUESTION
-            return session, self.PSY_QUESTION_TEXT
-        
-        else:
+        choice = self._menu_choices.get(norm)
+        if choice is None:
             return session, self.MENU_TEXT
 
-    def _handle_topic(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+        session.state, response = choice
+        return session, response
+
+    def _handle_topic(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка ввода темы консультации"""
-        session.consultation_form.topic = message
+        session.consultation_form.topic = message[:_MAX_TOPIC_LEN]
         session.state = State.CONSULT_FORM_GENDER
         return session, "Укажите ваш пол:"
 
-    def _handle_gender(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_gender(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка ввода пола"""
         session.consultation_form.gender = message
         session.state = State.CONSULT_FORM_AGE
         return session, "Укажите ваш возраст:"
 
-    def _handle_age(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_age(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка ввода возраста"""
         try:
             age = int(message)
@@ -150,20 +187,9 @@ class StateMachine:
         except ValueError:
             return session, "Пожалуйста, введите число (ваш возраст):"
 
-    def _handle_severity(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_severity(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка ввода критичности"""
-        severity_map = {
-            '1': Severity.LOW,
-            'низкая': Severity.LOW,
-            '2': Severity.MEDIUM,
-            'средняя': Severity.MEDIUM,
-            '3': Severity.HIGH,
-            'высокая': Severity.HIGH,
-            '4': Severity.CRITICAL,
-            'критическая': Severity.CRITICAL,
-        }
-        
-        severity = severity_map.get(message.strip().lower())
+        severity = _SEVERITY_MAP.get(norm)
         if severity:
             session.consultation_form.severity = severity
             session.state = State.CONSULT_FORM_MESSAGE
@@ -171,59 +197,71 @@ class StateMachine:
         else:
             return session, "Пожалуйста, выберите критичность (1-4 или название):"
 
-    def _handle_message(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_message(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка финального сообщения и создания заявки"""
-        session.consultation_form.message = message
-        
+        session.consultation_form.message = message[:_MAX_MESSAGE_LEN]
+
         # Заявка будет создана через use case
         # Здесь просто переходим в меню
         session.state = State.MENU
         
-        response = "✅ Заявка создана! Специалист свяжется с вами в ближайшее время.\n\n"
-        response += self.MENU_TEXT
-        
-        return session, response
+        return session, self.TICKET_CREATED_TEXT
 
-    def _handle_ai_chat(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_ai_chat(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка чата с ИИ"""
-        # Добавляем сообщение пользователя в контекст
-        session.ai_context.append({"role": "user", "content": message})
-        
+        # Ленивый импорт (см. process): после первого вызова это один
+        # lookup в sys.modules
+        from application.ai_service import generate_ai_reply
+
+        # Ограничиваем вход до добавления в контекст: худший случай окна —
+        # AI_CONTEXT_LIMIT × _MAX_AI_MSG_LEN, а не «что пришлёт клиент»
+        message = message[:_MAX_AI_MSG_LEN]
+
         try:
-            # Генерируем ответ через AI API
+            # Историю передаём до добавления нового сообщения — та же
+            # «история без последнего», но без копирования контекста;
+            # generate_ai_reply переданную историю не мутирует
             ai_response = generate_ai_reply(
                 user_id=session.user_id,
                 user_message=message,
-                history=session.ai_context[:-1]  # Передаем историю без последнего сообщения
+                history=session.ai_context
             )
-            
-            # Добавляем ответ AI в контекст
+
+            # Добавляем обе реплики в контекст; deque с maxlen сам
+            # обрезает историю до последних 20 сообщений (10 пар)
+            session.ai_context.append({"role": "user", "content": message})
             session.ai_context.append({"role": "assistant", "content": ai_response})
-            
-            # Ограничиваем историю последними 20 сообщениями (10 пар)
-            if len(session.ai_context) > 20:
-                session.ai_context = session.ai_context[-20:]
-            
+
             return session, ai_response
-            
+
         except Exception as e:
             logger.error(f"Error in AI chat handler: {type(e).__name__} - {str(e)[:100]}")
             fallback = "Извините, произошла ошибка при обработке вашего сообщения. Пожалуйста, попробуйте еще раз."
+            session.ai_context.append({"role": "user", "content": message})
             session.ai_context.append({"role": "assistant", "content": fallback})
             return session, fallback
 
-    def _handle_terms(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_terms(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка экрана условий"""
         # Любое сообщение возвращает в меню
         session.state = State.MENU
         return session, self.MENU_TEXT
 
-    def _handle_psy_question(self, session: UserSession, message: str) -> Tuple[UserSession, str]:
+    def _handle_psy_question(self, session: UserSession, message: str, norm: str) -> Tuple[UserSession, str]:
         """Обработка вопроса по психологии (заглушка)"""
-        response = f"❓ Ваш вопрос: {message}\n\n"
-        response += "Спасибо за вопрос! Специалист ответит на него в ближайшее время.\n\n"
-        
         session.state = State.MENU
-        response += self.MENU_TEXT
-        
-        return session, response
+        return session, f"❓ Ваш вопрос: {message}\n\n{self.PSY_QUESTION_REPLY_TAIL}"
+
+    # Диспетчеризация состояние -> обработчик: один словарь на класс
+    # (функции, а не связанные методы), а не копия на каждый экземпляр
+    _HANDLERS = {
+        State.MENU: _handle_menu,
+        State.CONSULT_FORM_TOPIC: _handle_topic,
+        State.CONSULT_FORM_GENDER: _handle_gender,
+        State.CONSULT_FORM_AGE: _handle_age,
+        State.CONSULT_FORM_SEVERITY: _handle_severity,
+        State.CONSULT_FORM_MESSAGE: _handle_message,
+        State.AI_CHAT: _handle_ai_chat,
+        State.TERMS: _handle_terms,
+        State.PSY_QUESTION: _handle_psy_question,
+    }
@@ -1,8 +1,15 @@
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Optional
 
+# Предел сообщений в чате заявки: deque с maxlen не даёт истории расти бесконечно
+TICKET_CHAT_HISTORY_LIMIT = 500
+
+# Предел контекста ИИ-диалога: 10 пар сообщений, deque обрезает сам
+AI_CONTEXT_LIMIT = 20
+
 
 class State(str, Enum):
     """Состояния пользователя в боте"""
@@ -51,7 +58,7 @@ class Severity(str, Enum):
     CRITICAL = "Критическая"
 
 
-@dataclass
+@dataclass(slots=True)
 class ConsultationForm:
     """Форма для консультации со специалистом"""
     topic: Optional[str] = None
@@ -61,17 +68,23 @@ class ConsultationForm:
     message: Optional[str] = None
 
     def is_complete(self) -> bool:
-        """Проверка, что форма заполнена полностью"""
-        return all([
-            self.topic,
-            self.gender,
-            self.age,
-            self.severity,
-            self.message
-        ])
-
-
-@dataclass
+        """Проверка, что форма заполнена полностью.
+
+        Сравниваем именно с None: «заполнено» значит «поле было введено»,
+        а валидность значений (возраст 1..120 и т.п.) обеспечивает
+        StateMachine на этапе ввода. Цепочка and обрывается на первом
+        незаполненном поле и не собирает промежуточный список.
+        """
+        return (
+            self.topic is not None
+            and self.gender is not None
+            and self.age is not None
+            and self.severity is not None
+            and self.message is not None
+        )
+
+
+@dataclass(slots=True)
 class Ticket:
     """Заявка на консультацию"""
     id: str
@@ -84,20 +97,36 @@ class Ticket:
     status: TicketStatus = TicketStatus.NEW
     created_at: datetime = field(default_factory=datetime.now)
     assigned_to: Optional[str] = None
-    chat_history: list[dict] = field(default_factory=list)
-
-
-@dataclass
+    chat_history: deque = field(
+        default_factory=lambda: deque(maxlen=TICKET_CHAT_HISTORY_LIMIT)
+    )
+    # Кэш строки для списков заявок: тема/критичность/дата не меняются
+    # после создания, поэтому инвалидация не нужна
+    _display_line: Optional[str] = field(default=None, repr=False, compare=False)
+
+    def display_line(self) -> str:
+        """Строка вида «тема (критичность) - дата» для страниц списков"""
+        if self._display_line is None:
+            topic = self.topic[:30] + "..." if len(self.topic) > 30 else self.topic
+            date_str = self.created_at.strftime("%d.%m")
+            self._display_line = f"{topic} ({self.severity.value}) - {date_str}"
+        return self._display_line
+
+
+@dataclass(slots=True)
 class UserSession:
     """Сессия пользователя"""
     user_id: str
     state: State = State.MENU
     consultation_form: ConsultationForm = field(default_factory=ConsultationForm)
-    ai_context: list[dict] = field(default_factory=list)
+    ai_context: deque = field(default_factory=lambda: deque(maxlen=AI_CONTEXT_LIMIT))
     current_ticket_id: Optional[str] = None
     active_chat_ticket_id: Optional[str] = None  # ID заявки для активного чата с психологом
     pagination_offset: int = 0  # Для пагинации списков
     selected_ticket_id: Optional[str] = None  # Выбранная заявка при назначении
+    # Кэш объекта выбранной заявки: живёт только в памяти процесса,
+    # в хранилище не сериализуется (при промахе заявка берётся из репозитория)
+    _selected_ticket: Optional[Ticket] = field(default=None, repr=False, compare=False)
 
     def reset_form(self):
         """Сброс формы консультации"""
@@ -105,7 +134,7 @@ class UserSession:
 
     def clear_ai_context(self):
         """Очистка контекста ИИ"""
-        self.ai_context = []
+        self.ai_context = deque(maxlen=AI_CONTEXT_LIMIT)
 
     def go_to_menu(self):
         """Возврат в меню"""
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from .models import UserSession, Ticket
 from .roles import UserProfile, UserRole
 
@@ -22,6 +22,27 @@ class SessionRepository(ABC):
         """Удалить сессию пользователя"""
         pass
 
+    def get_or_create(self, user_id: str) -> UserSession:
+        """Получить сессию пользователя, создав и сохранив новую при отсутствии.
+
+        Реализации с дешёвым доступом к хранилищу (in-memory) могут
+        переопределить метод одной операцией над dict.
+        """
+        session = self.get(user_id)
+        if session is None:
+            session = UserSession(user_id=user_id)
+            self.save(session)
+        return session
+
+    def save_many(self, sessions: List[UserSession]) -> None:
+        """Сохранить несколько сессий за один вызов.
+
+        Реализации с дорогим save (БД) могут переопределить метод
+        и писать всю пачку одной транзакцией.
+        """
+        for session in sessions:
+            self.save(session)
+
 
 class TicketRepository(ABC):
     """Интерфейс репозитория для заявок"""
@@ -31,6 +52,15 @@ class TicketRepository(ABC):
         """Создать новую заявку"""
         pass
     
+    def create_many(self, tickets: List[Ticket]) -> None:
+        """Создать несколько заявок за один вызов.
+
+        Реализации с дорогой записью (БД) могут переопределить метод
+        и вставлять всю пачку одной транзакцией.
+        """
+        for ticket in tickets:
+            self.create(ticket)
+
     @abstractmethod
     def get(self, ticket_id: str) -> Optional[Ticket]:
         """Получить заявку по ID"""
@@ -51,6 +81,53 @@ class TicketRepository(ABC):
         """Получить все заявки пользователя"""
         pass
 
+    def get_by_status_in(self, statuses) -> List[Ticket]:
+        """Получить заявки с одним из указанных статусов.
+
+        Реализации могут переопределить метод и отдавать заявки
+        по вторичному индексу вместо полного прохода по get_all().
+        """
+        statuses = set(statuses)
+        return [t for t in self.get_all() if t.status in statuses]
+
+    def get_by_assignee(self, user_id: str) -> List[Ticket]:
+        """Получить заявки, назначенные на указанного специалиста"""
+        return [t for t in self.get_all() if t.assigned_to == user_id]
+
+    def list_page(self, offset: int, limit: int, statuses=None,
+                  assigned_to: Optional[str] = None) -> Tuple[List[Ticket], int]:
+        """Получить страницу заявок и общее их количество.
+
+        Фильтр — по статусам или по назначенному специалисту; порядок —
+        от старых к новым, как у get_by_status_in/get_by_assignee.
+        Реализации с БД могут переопределить метод и выполнять проекцию,
+        фильтр и LIMIT/OFFSET на стороне SQL вместо среза полного списка.
+        """
+        if statuses is not None:
+            tickets = self.get_by_status_in(statuses)
+        elif assigned_to is not None:
+            tickets = self.get_by_assignee(assigned_to)
+        else:
+            tickets = self.get_all()
+        return tickets[offset:offset + limit], len(tickets)
+
+    def get_recent(self, limit: int) -> List[Ticket]:
+        """Получить последние созданные заявки (от старых к новым)"""
+        return self.get_all()[-limit:]
+
+    def count_active_by_assignee(self, statuses) -> dict:
+        """Посчитать заявки с указанными статусами по назначенным специалистам.
+
+        Возвращает {user_id: количество}; реализации могут заменить проход
+        по get_all() агрегирующим запросом (GROUP BY).
+        """
+        statuses = set(statuses)
+        counts: dict = {}
+        for t in self.get_all():
+            if t.assigned_to is not None and t.status in statuses:
+                counts[t.assigned_to] = counts.get(t.assigned_to, 0) + 1
+        return counts
+
 
 class RoleRepository(ABC):
     """Интерфейс репозитория для ролей пользователей"""
@@ -7,6 +7,11 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, Optional
 
+try:
+    import cachetools
+except ImportError:
+    cachetools = None
+
 
 class UserRole(str, Enum):
     """Роли пользователей в системе"""
@@ -15,7 +20,7 @@ class UserRole(str, Enum):
     ADMIN = "admin"
 
 
-@dataclass
+@dataclass(slots=True)
 class UserProfile:
     """Профиль пользователя с ролью"""
     user_id: str
@@ -39,34 +44,110 @@ class RoleManager:
         """
         self.users: Dict[str, UserProfile] = {}
         self.admin_ids = set(admin_ids or [])
+        # Кэш ролей с TTL: на горячем пути process_message роль берётся
+        # из кэша, а не из хранилища профилей
+        self._role_cache = (
+            cachetools.TTLCache(maxsize=10000, ttl=60) if cachetools is not None else None
+        )
         # Не создаем профили автоматически - только при первом взаимодействии
+        # Индекс username (casefold) -> user_id для поиска без перебора профилей
+        self._by_username: Dict[str, str] = {}
+        # Индекс роль -> ID (dict как упорядоченное множество, как в
+        # репозитории заявок): list_psychologists/list_admins читают его
+        # вместо прохода по всем профилям
+        self._role_members: Dict[UserRole, Dict[str, None]] = {
+            role: {} for role in UserRole
+        }
+        # Сколько профилей учтено в индексе ролей: расхождение с len(users)
+        # означает, что профили положили в users напрямую (загрузка из БД
+        # в тестах) — тогда индекс пересобирается
+        self._indexed_users = 0
     
     def get_or_create_user(self, user_id: str, username: str = None, 
                           first_name: str = None, last_name: str = None) -> UserProfile:
         """Получить или создать профиль пользователя"""
-        if user_id not in self.users:
+        # Один probe по dict вместо "in" + повторного доступа;
+        # НЕ обновляем метаданные существующего пользователя
+        profile = self.users.get(user_id)
+        if profile is None:
             # Новый пользователь
             role = UserRole.ADMIN if user_id in self.admin_ids else UserRole.USER
-            self.users[user_id] = UserProfile(
+            profile = UserProfile(
                 user_id=user_id,
                 role=role,
                 username=username,
                 first_name=first_name,
                 last_name=last_name
             )
-        
-        # НЕ обновляем метаданные существующего пользователя
-        return self.users[user_id]
+            self.users[user_id] = profile
+            self._index_username(profile)
+            self._index_role(profile)
+            self._invalidate_role(user_id)
+
+        return profile
     
+    def add_user(self, profile: UserProfile) -> None:
+        """Добавить готовый профиль (например, загруженный из БД)"""
+        replacing = profile.user_id in self.users
+        self.users[profile.user_id] = profile
+        self._index_username(profile)
+        if replacing:
+            self._unindex_role(profile.user_id)
+            self._indexed_users -= 1
+        self._index_role(profile)
+        self._invalidate_role(profile.user_id)
+
+    def _index_username(self, profile: UserProfile) -> None:
+        """Обновить индекс username -> user_id"""
+        if profile.username:
+            self._by_username[profile.username.casefold()] = profile.user_id
+
+    def _index_role(self, profile: UserProfile) -> None:
+        """Добавить профиль в индекс ролей"""
+        self._role_members[profile.role][profile.user_id] = None
+        self._indexed_users += 1
+
+    def _unindex_role(self, user_id: str) -> None:
+        """Убрать пользователя из индекса ролей (роль могла быть любой)"""
+        for members in self._role_members.values():
+            members.pop(user_id, None)
+
+    def _rebuild_role_index(self) -> None:
+        """Пересобрать индекс ролей по текущему содержимому users"""
+        self._role_members = {role: {} for role in UserRole}
+        for profile in self.users.values():
+            self._role_members[profile.role][profile.user_id] = None
+        self._indexed_users = len(self.users)
+
+    def _role_ids(self, role: UserRole) -> Dict[str, None]:
+        """ID пользователей с указанной ролью (по индексу)"""
+        if self._indexed_users != len(self.users):
+            self._rebuild_role_index()
+        return self._role_members[role]
+
     def get_user(self, user_id: str) -> Optional[UserProfile]:
         """Получить профиль пользователя"""
         return self.users.get(user_id)
     
     def get_role(self, user_id: str) -> UserRole:
         """Получить роль пользователя"""
+        if self._role_cache is not None:
+            cached = self._role_cache.get(user_id)
+            if cached is not None:
+                return cached
+
         if user_id in self.users:
-            return self.users[user_id].role
-        return UserRole.USER
+            role = self.users[user_id].role
+        else:
+            role = UserRole.USER
+
+        if self._role_cache is not None:
+            self._role_cache[user_id] = role
+        return role
+
+    def _invalidate_role(self, user_id: str) -> None:
+        if self._role_cache is not None:
+            self._role_cache.pop(user_id, None)
     
     def promote_to_psychologist(self, user_id: str) -> bool:
         """Повысить до психолога"""
@@ -79,6 +160,9 @@ class RoleManager:
         
         user.role = UserRole.PSYCHOLOGIST
         user.updated_at = datetime.now()
+        self._role_members[UserRole.USER].pop(user_id, None)
+        self._role_members[UserRole.PSYCHOLOGIST][user_id] = None
+        self._invalidate_role(user_id)
         return True
     
     def demote_psychologist(self, user_id: str) -> bool:
@@ -92,6 +176,9 @@ class RoleManager:
         
         user.role = UserRole.USER
         user.updated_at = datetime.now()
+        self._role_members[UserRole.PSYCHOLOGIST].pop(user_id, None)
+        self._role_members[UserRole.USER][user_id] = None
+        self._invalidate_role(user_id)
         return True
     
     def is_psychologist(self, user_id: str) -> bool:
@@ -107,21 +194,30 @@ class RoleManager:
         return self.get_role(user_id) == UserRole.ADMIN
     
     def list_psychologists(self) -> list[UserProfile]:
-        """Получить список психологов (без админов)"""
-        return [u for u in self.users.values() 
-                if u.role == UserRole.PSYCHOLOGIST]
-    
+        """Получить список психологов (без админов) по индексу ролей"""
+        return [self.users[uid] for uid in self._role_ids(UserRole.PSYCHOLOGIST)]
+
     def list_admins(self) -> list[UserProfile]:
-        """Получить список администраторов"""
-        return [u for u in self.users.values() if u.role == UserRole.ADMIN]
+        """Получить список администраторов по индексу ролей"""
+        return [self.users[uid] for uid in self._role_ids(UserRole.ADMIN)]
     
     def get_user_by_username(self, username: str) -> Optional[UserProfile]:
         """Найти пользователя по username (с @ или без)"""
         # Убираем @ если есть
-        clean_username = username.lstrip('@').lower()
+        clean_username = username.lstrip('@').casefold()
+        
+        # Быстрый путь — по индексу
+        user_id = self._by_username.get(clean_username)
+        if user_id is not None:
+            user = self.users.get(user_id)
+            if user and user.username and user.username.casefold() == clean_username:
+                return user
         
+        # Медленный путь: профиль могли положить в users напрямую —
+        # сканируем и пополняем индекс
         for user in self.users.values():
-            if user.username and user.username.lower() == clean_username:
+            if user.username and user.username.casefold() == clean_username:
+                self._by_username[clean_username] = user.user_id
                 return user
         return None
     
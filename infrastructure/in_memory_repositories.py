@@ -1,5 +1,6 @@
+from itertools import islice
 from typing import Optional, Dict, List
-from domain.models import UserSession, Ticket
+from domain.models import UserSession, Ticket, TicketStatus
 from domain.repositories import SessionRepository, TicketRepository
 
 
@@ -13,6 +14,17 @@ class InMemorySessionRepository(SessionRepository):
         """Получить сессию пользователя"""
         return self._sessions.get(user_id)
 
+    def get_or_create(self, user_id: str) -> UserSession:
+        """Получить или создать сессию одним обращением к dict.
+
+        UserSession не конструируем заранее: setdefault с готовым значением
+        аллоцировал бы сессию и на попадании.
+        """
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions.setdefault(user_id, UserSession(user_id=user_id))
+        return session
+
     def save(self, session: UserSession) -> None:
         """Сохранить сессию пользователя"""
         self._sessions[session.user_id] = session
@@ -32,10 +44,43 @@ class InMemoryTicketRepository(TicketRepository):
 
     def __init__(self):
         self._tickets: Dict[str, Ticket] = {}
+        # Вторичные индексы: dict как упорядоченное множество ID,
+        # чтобы выборки сохраняли порядок создания заявок
+        self._by_status: Dict[TicketStatus, Dict[str, None]] = {}
+        self._by_assignee: Dict[str, Dict[str, None]] = {}
+        # Снимок (status, assigned_to) на момент индексирования —
+        # update() по нему находит устаревшие записи индекса
+        self._indexed_state: Dict[str, tuple] = {}
+        # Порядковый номер создания: по нему сливаются корзины статусов
+        # без прохода по всем заявкам
+        self._created_seq: Dict[str, int] = {}
+
+    def _index(self, ticket: Ticket) -> None:
+        """Добавить заявку во вторичные индексы"""
+        self._by_status.setdefault(ticket.status, {})[ticket.id] = None
+        if ticket.assigned_to is not None:
+            self._by_assignee.setdefault(ticket.assigned_to, {})[ticket.id] = None
+        self._indexed_state[ticket.id] = (ticket.status, ticket.assigned_to)
+
+    def _unindex(self, ticket_id: str) -> None:
+        """Убрать заявку из вторичных индексов"""
+        state = self._indexed_state.pop(ticket_id, None)
+        if state is None:
+            return
+        old_status, old_assignee = state
+        bucket = self._by_status.get(old_status)
+        if bucket is not None:
+            bucket.pop(ticket_id, None)
+        if old_assignee is not None:
+            bucket = self._by_assignee.get(old_assignee)
+            if bucket is not None:
+                bucket.pop(ticket_id, None)
 
     def create(self, ticket: Ticket) -> Ticket:
         """Создать новую заявку"""
         self._tickets[ticket.id] = ticket
+        self._created_seq.setdefault(ticket.id, len(self._created_seq))
+        self._index(ticket)
         return ticket
 
     def get(self, ticket_id: str) -> Optional[Ticket]:
@@ -50,11 +95,55 @@ class InMemoryTicketRepository(TicketRepository):
         """Обновить заявку"""
         if ticket.id in self._tickets:
             self._tickets[ticket.id] = ticket
+            self._unindex(ticket.id)
+            self._index(ticket)
 
     def get_by_user(self, user_id: str) -> List[Ticket]:
         """Получить все заявки пользователя"""
         return [t for t in self._tickets.values() if t.user_id == user_id]
 
+    def get_by_status_in(self, statuses) -> List[Ticket]:
+        """Получить заявки с одним из указанных статусов (по индексу)"""
+        ids = []
+        for status in statuses:
+            ids.extend(self._by_status.get(status, ()))
+        # Сливаем корзины по номеру создания: O(найденного), а не проход
+        # по всем заявкам. На порядок внутри корзины полагаться нельзя —
+        # update() переиндексирует заявку в конец её корзины
+        ids.sort(key=self._created_seq.__getitem__)
+        return [self._tickets[tid] for tid in ids]
+
+    def get_by_assignee(self, user_id: str) -> List[Ticket]:
+        """Получить заявки, назначенные на специалиста (по индексу)"""
+        ids = self._by_assignee.get(user_id)
+        if not ids:
+            return []
+        # Тот же порядок создания, что и у get_by_status_in: update()
+        # переиндексирует заявку в конец корзины, сырой порядок корзины
+        # перетасовал бы список после каждого изменения заявки
+        ids = sorted(ids, key=self._created_seq.__getitem__)
+        return [self._tickets[tid] for tid in ids]
+
+    def get_recent(self, limit: int) -> List[Ticket]:
+        """Получить последние созданные заявки (от старых к новым)"""
+        recent = list(islice(reversed(self._tickets.values()), limit))
+        recent.reverse()
+        return recent
+
+    def count_active_by_assignee(self, statuses) -> dict:
+        """Посчитать заявки по специалистам без прохода по всем заявкам"""
+        statuses = set(statuses)
+        counts: dict = {}
+        for user_id, ids in self._by_assignee.items():
+            n = sum(1 for tid in ids if self._indexed_state[tid][0] in statuses)
+            if n:
+                counts[user_id] = n
+        return counts
+
     def clear_all(self):
         """Очистить все заявки (для тестов)"""
         self._tickets.clear()
+        self._by_status.clear()
+        self._by_assignee.clear()
+        self._indexed_state.clear()
+        self._created_seq.clear()
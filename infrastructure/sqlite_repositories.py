@@ -2,34 +2,128 @@
 SQLite хранилище для ролей и заявок
 """
 
+import queue
 import sqlite3
 import json
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List
+from itertools import chain
+from typing import Dict, Optional, List, Tuple
 
-from domain.models import UserSession, Ticket, TicketStatus
+from collections import deque
+
+from domain.models import UserSession, Ticket, TicketStatus, TICKET_CHAT_HISTORY_LIMIT, AI_CONTEXT_LIMIT
 from domain.roles import UserProfile, UserRole
 from domain.repositories import SessionRepository, TicketRepository
 
 
+class _ConnectionPool:
+    """LIFO-пул долгоживущих подключений к одному файлу БД.
+
+    sqlite3.connect на каждый запрос — это syscall-ы открытия файла и
+    холодный page cache; пул держит подключения открытыми, а LIFO-порядок
+    отдаёт последнее использованное, у которого кэш страниц ещё горячий.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 5):
+        self.db_path = db_path
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=max_size)
+
+    def _create_connection(self) -> sqlite3.Connection:
+        # check_same_thread=False: подключение может вернуться в пул из
+        # другого потока (фоновые задачи); доступ сериализуется пулом
+        # cached_statements: C-уровневый кэш подготовленных запросов;
+        # 256 вмещает все SQL репозиториев с запасом, так что горячие
+        # get/save не проходят sqlite3_prepare_v2 повторно
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        # PRAGMA действуют на подключение, поэтому выставляются здесь,
+        # а не один раз при инициализации БД:
+        #  - synchronous=NORMAL: в WAL-режиме fsync на каждый COMMIT не
+        #    нужен, долговечность обеспечивает checkpoint
+        #  - busy_timeout: ждать снятия блокировки вместо SQLITE_BUSY
+        #  - temp_store/cache_size/mmap_size: временные структуры и кэш
+        #    страниц в памяти, чтение горячих страниц через mmap
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -20000")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        return conn
+
+    @contextmanager
+    def acquire(self):
+        """Взять подключение из пула (или открыть новое) и вернуть по выходе"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._create_connection()
+        try:
+            yield conn
+        finally:
+            # Не возвращаем в пул подключение с незавершённой транзакцией:
+            # откат здесь дешевле, чем неожиданный BEGIN у следующего клиента
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+# Пулы процесса, по одному на файл БД: репозитории сессий, заявок и ролей
+# обычно смотрят в один bot_data.db и делят его подключения
+_POOLS: Dict[str, _ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _get_pool(db_path: str) -> _ConnectionPool:
+    pool = _POOLS.get(db_path)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.setdefault(db_path, _ConnectionPool(db_path))
+    return pool
+
+
 class SQLiteDatabase:
     """Базовый класс для работы с SQLite"""
-    
+
     def __init__(self, db_path: str = "bot_data.db"):
         self.db_path = db_path
+        self._pool = _get_pool(db_path)
         self._init_db()
-    
+
     def _init_db(self):
         """Инициализировать БД"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.close()
-    
-    def get_connection(self):
-        """Получить подключение к БД"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        with self.connection() as conn:
+            # WAL хранится в самом файле БД — достаточно включить один раз:
+            # запись становится append-only в -wal, читатели не ждут писателя
+            conn.execute("PRAGMA journal_mode = WAL")
+
+    def connection(self):
+        """Контекстный менеджер подключения из пула"""
+        return self._pool.acquire()
+
+    @contextmanager
+    def transaction(self):
+        """Сгруппировать несколько операторов в одну транзакцию.
+
+        BEGIN/COMMIT вокруг всего блока: один fsync на пачку вместо
+        fsync на каждый оператор; при исключении — откат.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
 
 
 class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
@@ -37,7 +131,11 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
     
     def _init_db(self):
         super()._init_db()
-        conn = self.get_connection()
+        with self.connection() as conn:
+            self._create_tables(conn)
+
+    @staticmethod
+    def _create_tables(conn) -> None:
         conn.execute("""
             CREATE TABLE IF NOT EXISTS sessions (
                 user_id TEXT PRIMARY KEY,
@@ -66,19 +164,19 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
             conn.execute("ALTER TABLE sessions ADD COLUMN active_chat_ticket_id TEXT")
         except:
             pass
-        
+
         conn.commit()
-        conn.close()
-    
+
+    # SQL горячего пути — константы класса: один и тот же объект строки
+    # на каждый вызов, кэш подготовленных запросов попадает всегда
+    _GET_SQL = "SELECT * FROM sessions WHERE user_id = ?"
+    _DELETE_SQL = "DELETE FROM sessions WHERE user_id = ?"
+
     def get(self, user_id: str) -> Optional[UserSession]:
         """Получить сессию"""
-        conn = self.get_connection()
-        cursor = conn.execute(
-            "SELECT * FROM sessions WHERE user_id = ?", (user_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
-        
+        with self.connection() as conn:
+            row = conn.execute(self._GET_SQL, (user_id,)).fetchone()
+
         if not row:
             return None
         
@@ -89,7 +187,7 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
         from domain.models import ConsultationForm, State, Severity
         
         form_data = json.loads(row_dict['form_data']) if row_dict['form_data'] else {}
-        ai_context = json.loads(row_dict['ai_context']) if row_dict['ai_context'] else []
+        ai_context_data = json.loads(row_dict['ai_context']) if row_dict['ai_context'] else ()
         
         session = UserSession(user_id=user_id, state=State(row_dict['state']))
         
@@ -100,7 +198,7 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
                 form_data['severity'] = Severity(form_data['severity'])
             session.consultation_form = ConsultationForm(**form_data)
         
-        session.ai_context = ai_context
+        session.ai_context = deque(ai_context_data, maxlen=AI_CONTEXT_LIMIT)
         session.current_ticket_id = row_dict.get('current_ticket_id')
         session.pagination_offset = row_dict.get('pagination_offset', 0) or 0
         session.selected_ticket_id = row_dict.get('selected_ticket_id')
@@ -108,10 +206,9 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
         
         return session
     
-    def save(self, session: UserSession) -> None:
-        """Сохранить сессию"""
-        conn = self.get_connection()
-        
+    @staticmethod
+    def _session_to_row(session: UserSession) -> tuple:
+        """Собрать кортеж значений для INSERT OR REPLACE"""
         form_data = {
             'topic': session.consultation_form.topic,
             'gender': session.consultation_form.gender,
@@ -119,31 +216,130 @@ class SQLiteSessionRepository(SessionRepository, SQLiteDatabase):
             'severity': session.consultation_form.severity.value if session.consultation_form.severity else None,
             'message': session.consultation_form.message,
         }
-        
-        conn.execute("""
-            INSERT OR REPLACE INTO sessions 
-            (user_id, state, form_data, ai_context, current_ticket_id, pagination_offset, selected_ticket_id, active_chat_ticket_id, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+
+        return (
             session.user_id,
             session.state.value,
             json.dumps(form_data),
-            json.dumps(session.ai_context),
+            json.dumps(list(session.ai_context)),
             session.current_ticket_id,
             session.pagination_offset,
             session.selected_ticket_id,
             session.active_chat_ticket_id,
             datetime.now().isoformat()
-        ))
-        conn.commit()
-        conn.close()
-    
+        )
+
+    _SAVE_PREFIX = """
+            INSERT OR REPLACE INTO sessions
+            (user_id, state, form_data, ai_context, current_ticket_id, pagination_offset, selected_ticket_id, active_chat_ticket_id, updated_at)
+            VALUES """
+    _SAVE_SQL = _SAVE_PREFIX + "(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    # Размер полной пачки многострочного INSERT: 9 параметров на строку,
+    # лимит SQLite на плейсхолдеры — 999
+    _SAVE_BATCH_ROWS = 999 // 9
+    # SQL полной пачки собран один раз: неизменная строка попадает
+    # в statement-кэш подключения
+    _SAVE_BATCH_SQL = _SAVE_PREFIX + ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?)"] * _SAVE_BATCH_ROWS)
+
+    def save(self, session: UserSession) -> None:
+        """Сохранить сессию"""
+        with self.connection() as conn:
+            conn.execute(self._SAVE_SQL, self._session_to_row(session))
+            conn.commit()
+
+    def save_many(self, sessions: List[UserSession]) -> None:
+        """Сохранить пачку сессий одной транзакцией.
+
+        Полные пачки идут многострочным INSERT ... VALUES (...),(...) —
+        меньше циклов prepare/step на строку; остаток — через executemany
+        с однострочным SQL, чтобы не плодить строки запросов разной длины.
+        """
+        if not sessions:
+            return
+        rows = [self._session_to_row(s) for s in sessions]
+        with self.connection() as conn:
+            n = self._SAVE_BATCH_ROWS
+            full = len(rows) // n * n
+            for i in range(0, full, n):
+                conn.execute(self._SAVE_BATCH_SQL, list(chain.from_iterable(rows[i:i + n])))
+            if full < len(rows):
+                conn.executemany(self._SAVE_SQL, rows[full:])
+            conn.commit()
+
     def delete(self, user_id: str) -> None:
         """Удалить сессию"""
-        conn = self.get_connection()
-        conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute(self._DELETE_SQL, (user_id,))
+            conn.commit()
+
+
+class LazyTicket:
+    """Ленивое представление заявки поверх спроецированной строки списка.
+
+    Страницам списков (очередь и "мои заявки") нужны только id, user_id,
+    topic, severity, status, assigned_to и created_at — а _row_to_ticket
+    раскодирует всё, включая JSON chat_history, который у долгих
+    консультаций может быть большим. Здесь дорогие поля (enum'ы, дата)
+    декодируются при первом обращении и мемоизируются; дешёвые читаются
+    прямо из sqlite3.Row. Представление только для чтения и только со
+    столбцами списка (_PAGE_COLUMNS) — для полного объекта и мутаций
+    берите Ticket через get().
+    """
+
+    __slots__ = ('_row', '_cache')
+
+    def __init__(self, row):
+        self._row = row
+        self._cache = {}
+
+    # Дешёвые поля: прямое чтение из строки
+    @property
+    def id(self) -> str:
+        return self._row['id']
+
+    @property
+    def user_id(self) -> str:
+        return self._row['user_id']
+
+    @property
+    def topic(self) -> str:
+        return self._row['topic']
+
+    @property
+    def assigned_to(self) -> Optional[str]:
+        return self._row['assigned_to']
+
+    # Дорогие поля: декодирование при первом обращении
+    @property
+    def severity(self):
+        value = self._cache.get('severity')
+        if value is None:
+            from domain.models import Severity
+            value = self._cache['severity'] = Severity(self._row['severity'])
+        return value
+
+    @property
+    def status(self) -> TicketStatus:
+        value = self._cache.get('status')
+        if value is None:
+            value = self._cache['status'] = TicketStatus(self._row['status'])
+        return value
+
+    @property
+    def created_at(self) -> datetime:
+        value = self._cache.get('created_at')
+        if value is None:
+            value = self._cache['created_at'] = datetime.fromisoformat(self._row['created_at'])
+        return value
+
+    def display_line(self) -> str:
+        """Строка для страниц списков — как у Ticket.display_line()"""
+        line = self._cache.get('display_line')
+        if line is None:
+            topic = self.topic[:30] + "..." if len(self.topic) > 30 else self.topic
+            date_str = self.created_at.strftime("%d.%m")
+            line = self._cache['display_line'] = f"{topic} ({self.severity.value}) - {date_str}"
+        return line
 
 
 class SQLiteTicketRepository(TicketRepository, SQLiteDatabase):
@@ -151,8 +347,8 @@ class SQLiteTicketRepository(TicketRepository, SQLiteDatabase):
     
     def _init_db(self):
         super()._init_db()
-        conn = self.get_connection()
-        conn.execute("""
+        with self.connection() as conn:
+            conn.execute("""
             CREATE TABLE IF NOT EXISTS tickets (
                 id TEXT PRIMARY KEY,
                 user_id TEXT NOT NULL,
@@ -168,17 +364,39 @@ class SQLiteTicketRepository(TicketRepository, SQLiteDatabase):
                 chat_history TEXT
             )
         """)
-        conn.commit()
-        conn.close()
-    
-    def create(self, ticket: Ticket) -> Ticket:
-        """Создать заявку"""
-        conn = self.get_connection()
-        conn.execute("""
-            INSERT INTO tickets 
+            # Вторичные индексы под выборки очереди и "моих заявок".
+            # Составные (…, created_at DESC) покрывают и фильтр, и ORDER BY,
+            # убирая шаг сортировки; старый одностолбцовый индекс по status
+            # вытеснен составным
+            conn.execute("DROP INDEX IF EXISTS idx_tickets_status")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tickets_status_created"
+                " ON tickets(status, created_at DESC)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tickets_user_created"
+                " ON tickets(user_id, created_at DESC)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_assigned_to ON tickets(assigned_to)")
+            conn.commit()
+            # Статистика для планировщика, чтобы новые индексы применялись
+            conn.execute("ANALYZE")
+
+    _INSERT_PREFIX = """
+            INSERT INTO tickets
             (id, user_id, topic, gender, age, severity, message, status, assigned_to, created_at, updated_at, chat_history)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+            VALUES """
+    _INSERT_SQL = _INSERT_PREFIX + "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    # 12 параметров на строку при лимите 999 плейсхолдеров (см. сессии)
+    _INSERT_BATCH_ROWS = 999 // 12
+    _INSERT_BATCH_SQL = _INSERT_PREFIX + ", ".join(
+        ["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * _INSERT_BATCH_ROWS
+    )
+
+    @staticmethod
+    def _ticket_to_row(ticket: Ticket) -> tuple:
+        """Собрать кортеж значений для INSERT"""
+        return (
             ticket.id,
             ticket.user_id,
             ticket.topic,
@@ -190,61 +408,164 @@ class SQLiteTicketRepository(TicketRepository, SQLiteDatabase):
             ticket.assigned_to,
             ticket.created_at.isoformat(),
             datetime.now().isoformat(),
-            json.dumps(ticket.chat_history)
-        ))
-        conn.commit()
-        conn.close()
+            json.dumps(list(ticket.chat_history))
+        )
+
+    def create(self, ticket: Ticket) -> Ticket:
+        """Создать заявку"""
+        with self.connection() as conn:
+            conn.execute(self._INSERT_SQL, self._ticket_to_row(ticket))
+            conn.commit()
         return ticket
-    
+
+    def create_many(self, tickets: List[Ticket]) -> None:
+        """Создать пачку заявок одной транзакцией.
+
+        Вставка по одной — это fsync на каждую строку; BEGIN/COMMIT
+        вокруг executemany оставляет один fsync на всю пачку
+        (массовая загрузка, миграции).
+        """
+        if not tickets:
+            return
+        rows = [self._ticket_to_row(t) for t in tickets]
+        with self.transaction() as conn:
+            n = self._INSERT_BATCH_ROWS
+            full = len(rows) // n * n
+            for i in range(0, full, n):
+                conn.execute(self._INSERT_BATCH_SQL, list(chain.from_iterable(rows[i:i + n])))
+            if full < len(rows):
+                conn.executemany(self._INSERT_SQL, rows[full:])
+
+    _GET_SQL = "SELECT * FROM tickets WHERE id = ?"
+    _UPDATE_SQL = """
+            UPDATE tickets
+            SET status = ?, assigned_to = ?, updated_at = ?, chat_history = ?
+            WHERE id = ?
+        """
+
     def get(self, ticket_id: str) -> Optional[Ticket]:
         """Получить заявку"""
-        conn = self.get_connection()
-        cursor = conn.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
+        with self.connection() as conn:
+            row = conn.execute(self._GET_SQL, (ticket_id,)).fetchone()
+
         if not row:
             return None
-        
+
         return self._row_to_ticket(row)
-    
+
     def get_all(self) -> List[Ticket]:
         """Получить все заявки"""
-        conn = self.get_connection()
-        cursor = conn.execute("SELECT * FROM tickets ORDER BY created_at DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        
+        with self.connection() as conn:
+            rows = conn.execute("SELECT * FROM tickets ORDER BY created_at DESC").fetchall()
+
         return [self._row_to_ticket(row) for row in rows]
-    
+
+    # Проекция для страниц списков: без message и chat_history — самых
+    # тяжёлых столбцов, которые списку не нужны
+    _PAGE_COLUMNS = "id, user_id, topic, severity, status, assigned_to, created_at"
+
+    def list_page(self, offset: int, limit: int, statuses=None,
+                  assigned_to: Optional[str] = None) -> Tuple[List[LazyTicket], int]:
+        """Страница заявок: проекция, фильтр и LIMIT/OFFSET на стороне SQL.
+
+        Читает и разбирает O(страницы) строк вместо всей таблицы; общее
+        количество считает COUNT(*) по тем же индексам. Порядок — от
+        старых к новым, как у get_by_status_in/get_by_assignee.
+        Возвращает ленивые представления только со столбцами списка —
+        для полного объекта берите get().
+        """
+        if statuses is not None:
+            values = [s.value for s in statuses]
+            where = f"WHERE status IN ({', '.join('?' * len(values))})"
+            params = values
+        elif assigned_to is not None:
+            where = "WHERE assigned_to = ?"
+            params = [assigned_to]
+        else:
+            where = ""
+            params = []
+
+        with self.connection() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM tickets {where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"""SELECT {self._PAGE_COLUMNS} FROM tickets {where}
+                    ORDER BY created_at LIMIT ? OFFSET ?""",
+                params + [limit, offset]
+            ).fetchall()
+
+        return [LazyTicket(row) for row in rows], total
+
     def get_by_user(self, user_id: str) -> List[Ticket]:
         """Получить заявки пользователя"""
-        conn = self.get_connection()
-        cursor = conn.execute(
-            "SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC",
-            (user_id,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC",
+                (user_id,)
+            ).fetchall()
+
         return [self._row_to_ticket(row) for row in rows]
-    
+
+    def get_by_status_in(self, statuses) -> List[Ticket]:
+        """Получить заявки с одним из указанных статусов (по индексу)"""
+        statuses = [s.value for s in statuses]
+        placeholders = ", ".join("?" * len(statuses))
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM tickets WHERE status IN ({placeholders}) ORDER BY created_at",
+                statuses
+            ).fetchall()
+
+        return [self._row_to_ticket(row) for row in rows]
+
+    def get_by_assignee(self, user_id: str) -> List[Ticket]:
+        """Получить заявки, назначенные на специалиста (по индексу)"""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tickets WHERE assigned_to = ? ORDER BY created_at",
+                (user_id,)
+            ).fetchall()
+
+        return [self._row_to_ticket(row) for row in rows]
+
+    def get_recent(self, limit: int) -> List[Ticket]:
+        """Получить последние созданные заявки (от старых к новым)"""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tickets ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+        tickets = [self._row_to_ticket(row) for row in rows]
+        tickets.reverse()
+        return tickets
+
+    def count_active_by_assignee(self, statuses) -> dict:
+        """Агрегировать количество заявок по специалистам на стороне БД"""
+        statuses = [s.value for s in statuses]
+        placeholders = ", ".join("?" * len(statuses))
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"""SELECT assigned_to, COUNT(*) AS cnt FROM tickets
+                    WHERE assigned_to IS NOT NULL AND status IN ({placeholders})
+                    GROUP BY assigned_to""",
+                statuses
+            ).fetchall()
+
+        return {row['assigned_to']: row['cnt'] for row in rows}
+
     def update(self, ticket: Ticket) -> None:
         """Обновить заявку"""
-        conn = self.get_connection()
-        conn.execute("""
-            UPDATE tickets 
-            SET status = ?, assigned_to = ?, updated_at = ?, chat_history = ?
-            WHERE id = ?
-        """, (
-            ticket.status.value,
-            ticket.assigned_to,
-            datetime.now().isoformat(),
-            json.dumps(ticket.chat_history),
-            ticket.id
-        ))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute(self._UPDATE_SQL, (
+                ticket.status.value,
+                ticket.assigned_to,
+                datetime.now().isoformat(),
+                json.dumps(list(ticket.chat_history)),
+                ticket.id
+            ))
+            conn.commit()
     
     @staticmethod
     def _row_to_ticket(row) -> Ticket:
@@ -262,126 +583,144 @@ class SQLiteTicketRepository(TicketRepository, SQLiteDatabase):
             status=TicketStatus(row['status']),
             assigned_to=row['assigned_to'],
             created_at=datetime.fromisoformat(row['created_at']),
-            chat_history=json.loads(row['chat_history']) if row['chat_history'] else []
+            chat_history=deque(
+                json.loads(row['chat_history']) if row['chat_history'] else [],
+                maxlen=TICKET_CHAT_HISTORY_LIMIT
+            )
         )
 
 
-class SQLiteRoleRepository:
+class SQLiteRoleRepository(SQLiteDatabase):
     """SQLite хранилище для ролей"""
-    
-    def __init__(self, db_path: str = "bot_data.db"):
-        self.db_path = db_path
-        self._init_db()
-    
+
+    # Предел кэша ролей: при переполнении проще сбросить целиком,
+    # чем вести LRU-порядок ради редкого события
+    _ROLE_CACHE_MAX = 10000
+
+    def __init__(self, db_path: str = "bot_data.db", cache_ttl: float = 60.0):
+        super().__init__(db_path)
+        # Кэш ролей с TTL: get_role зовётся на каждое обновление от
+        # Telegram ради значения, которое меняется редко; попадание —
+        # это чтение dict вместо запроса к SQLite
+        self._cache_ttl = cache_ttl
+        self._role_cache: Dict[str, tuple] = {}
+        self._cache_lock = threading.Lock()
+
+    def _cache_role(self, user_id: str, role: UserRole) -> None:
+        with self._cache_lock:
+            if len(self._role_cache) >= self._ROLE_CACHE_MAX:
+                self._role_cache.clear()
+            self._role_cache[user_id] = (role, time.monotonic() + self._cache_ttl)
+
+    def _invalidate_role_cache(self, user_id: str) -> None:
+        with self._cache_lock:
+            self._role_cache.pop(user_id, None)
+
     def _init_db(self):
         """Инициализировать таблицу ролей"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS user_roles (
-                user_id TEXT PRIMARY KEY,
-                role TEXT NOT NULL,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
-    
-    def get_or_create(self, user_id: str, username: str = None, 
+        super()._init_db()
+        with self.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_roles (
+                    user_id TEXT PRIMARY KEY,
+                    role TEXT NOT NULL,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            # list_by_role фильтрует по role — без индекса это полный скан
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_roles_role ON user_roles(role)")
+            conn.commit()
+            conn.execute("ANALYZE")
+
+    # UPSERT одним запросом: вставка нового профиля или, при конфликте,
+    # no-op-обновление существующего — RETURNING в обоих случаях отдаёт
+    # хранимую строку, метаданные существующего профиля не трогаются
+    _GET_OR_CREATE_SQL = """
+            INSERT INTO user_roles
+            (user_id, role, username, first_name, last_name, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET user_id = user_id
+            RETURNING *
+        """
+
+    def get_or_create(self, user_id: str, username: str = None,
                      first_name: str = None, last_name: str = None) -> UserProfile:
-        """Получить или создать профиль"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute(
-            "SELECT * FROM user_roles WHERE user_id = ?", (user_id,)
+        """Получить или создать профиль (один запрос вместо SELECT+INSERT)"""
+        now = datetime.now().isoformat()
+        with self.connection() as conn:
+            row = conn.execute(self._GET_OR_CREATE_SQL, (
+                user_id, UserRole.USER.value, username, first_name, last_name,
+                now, now
+            )).fetchone()
+            conn.commit()
+
+        # Роль уже известна из RETURNING — прогреваем кэш попутно
+        self._cache_role(user_id, UserRole(row[1]))
+        return UserProfile(
+            user_id=row[0],
+            role=UserRole(row[1]),
+            username=row[2],
+            first_name=row[3],
+            last_name=row[4],
+            created_at=datetime.fromisoformat(row[5]),
+            updated_at=datetime.fromisoformat(row[6])
         )
-        row = cursor.fetchone()
-        
-        if not row:
-            # Создаем новый профиль
+
+    def set_role(self, user_id: str, role: UserRole) -> None:
+        """Установить роль пользователю"""
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE user_roles SET role = ?, updated_at = ? WHERE user_id = ?",
+                (role.value, datetime.now().isoformat(), user_id)
+            )
+            conn.commit()
+        self._invalidate_role_cache(user_id)
+
+    def save_user(self, profile: UserProfile) -> None:
+        """Сохранить или обновить профиль пользователя"""
+        with self.connection() as conn:
             conn.execute("""
-                INSERT INTO user_roles 
+                INSERT OR REPLACE INTO user_roles
                 (user_id, role, username, first_name, last_name, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (
-                user_id, UserRole.USER.value, username, first_name, last_name,
-                datetime.now().isoformat(), datetime.now().isoformat()
+                profile.user_id,
+                profile.role.value,
+                profile.username,
+                profile.first_name,
+                profile.last_name,
+                profile.created_at.isoformat(),
+                profile.updated_at.isoformat()
             ))
             conn.commit()
-            profile = UserProfile(
-                user_id=user_id,
-                role=UserRole.USER,
-                username=username,
-                first_name=first_name,
-                last_name=last_name
-            )
-        else:
-            profile = UserProfile(
-                user_id=row[0],
-                role=UserRole(row[1]),
-                username=row[2],
-                first_name=row[3],
-                last_name=row[4],
-                created_at=datetime.fromisoformat(row[5]),
-                updated_at=datetime.fromisoformat(row[6])
-            )
-        
-        conn.close()
-        return profile
-    
-    def set_role(self, user_id: str, role: UserRole) -> None:
-        """Установить роль пользователю"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute(
-            "UPDATE user_roles SET role = ?, updated_at = ? WHERE user_id = ?",
-            (role.value, datetime.now().isoformat(), user_id)
-        )
-        conn.commit()
-        conn.close()
-    
-    def save_user(self, profile: UserProfile) -> None:
-        """Сохранить или обновить профиль пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("""
-            INSERT OR REPLACE INTO user_roles 
-            (user_id, role, username, first_name, last_name, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            profile.user_id,
-            profile.role.value,
-            profile.username,
-            profile.first_name,
-            profile.last_name,
-            profile.created_at.isoformat(),
-            profile.updated_at.isoformat()
-        ))
-        conn.commit()
-        conn.close()
-    
+        self._invalidate_role_cache(profile.user_id)
+
     def get_role(self, user_id: str) -> UserRole:
-        """Получить роль пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute(
-            "SELECT role FROM user_roles WHERE user_id = ?", (user_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return UserRole(row[0])
-        return UserRole.USER
-    
+        """Получить роль пользователя (с кэшем на TTL)"""
+        cached = self._role_cache.get(user_id)
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT role FROM user_roles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+        role = UserRole(row[0]) if row else UserRole.USER
+        self._cache_role(user_id, role)
+        return role
+
     def list_by_role(self, role: UserRole) -> List[UserProfile]:
         """Получить пользователей с определенной ролью"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute(
-            "SELECT * FROM user_roles WHERE role = ?", (role.value,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM user_roles WHERE role = ?", (role.value,)
+            ).fetchall()
+
         return [UserProfile(
             user_id=row[0],
             role=UserRole(row[1]),
@@ -394,16 +733,14 @@ class SQLiteRoleRepository:
     
     def get_user(self, user_id: str) -> Optional[UserProfile]:
         """Получить профиль пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute(
-            "SELECT * FROM user_roles WHERE user_id = ?", (user_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
-        
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM user_roles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
         if not row:
             return None
-        
+
         return UserProfile(
             user_id=row[0],
             role=UserRole(row[1]),
@@ -416,10 +753,10 @@ class SQLiteRoleRepository:
     
     def delete_user(self, user_id: str) -> None:
         """Удалить пользователя"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("DELETE FROM user_roles WHERE user_id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            conn.execute("DELETE FROM user_roles WHERE user_id = ?", (user_id,))
+            conn.commit()
+        self._invalidate_role_cache(user_id)
     
     def get_users_by_role(self, role: UserRole) -> List[UserProfile]:
         """Получить пользователей по роли (алиас для list_by_role)"""
@@ -427,11 +764,9 @@ class SQLiteRoleRepository:
     
     def get_all_users(self) -> List[UserProfile]:
         """Получить всех пользователей"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute("SELECT * FROM user_roles")
-        rows = cursor.fetchall()
-        conn.close()
-        
+        with self.connection() as conn:
+            rows = conn.execute("SELECT * FROM user_roles").fetchall()
+
         return [UserProfile(
             user_id=row[0],
             role=UserRole(row[1]),
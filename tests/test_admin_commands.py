@@ -29,8 +29,32 @@ def setup_admin_bot():
     # Создаём админа
     role_manager.get_or_create_user("admin_123", "admin_user", "Admin", "User")
     
-    # Мок для ticket_repo
+    # Мок для ticket_repo: индексные выборки эмулируем поверх get_all,
+    # как это делают реализации по умолчанию в TicketRepository
     ticket_repo.get_all.return_value = []
+    ticket_repo.get_by_status_in.side_effect = (
+        lambda statuses: [t for t in ticket_repo.get_all() if t.status in set(statuses)]
+    )
+    ticket_repo.get_by_assignee.side_effect = (
+        lambda uid: [t for t in ticket_repo.get_all() if t.assigned_to == uid]
+    )
+    ticket_repo.get_recent.side_effect = lambda n: ticket_repo.get_all()[-n:]
+    def _list_page(offset, limit, statuses=None, assigned_to=None):
+        if statuses is not None:
+            tickets = ticket_repo.get_by_status_in(statuses)
+        elif assigned_to is not None:
+            tickets = ticket_repo.get_by_assignee(assigned_to)
+        else:
+            tickets = ticket_repo.get_all()
+        return tickets[offset:offset + limit], len(tickets)
+    ticket_repo.list_page.side_effect = _list_page
+    def _count_active(statuses):
+        counts = {}
+        for t in ticket_repo.get_all():
+            if t.assigned_to is not None and t.status in set(statuses):
+                counts[t.assigned_to] = counts.get(t.assigned_to, 0) + 1
+        return counts
+    ticket_repo.count_active_by_assignee.side_effect = _count_active
     
     return {
         'bot_service': bot_service,
@@ -393,6 +417,9 @@ class TestPsychologistQueuePagination:
         self._setup_psy(env)
         tickets = [_make_ticket(f"ticket-{i}", f"Тема {i}") for i in range(3)]
         env['ticket_repo'].get_all.return_value = tickets
+        env['ticket_repo'].get.side_effect = (
+            lambda tid: next((t for t in tickets if t.id == tid), None)
+        )
 
         session = UserSession(user_id="psy_001", state=State.PSY_TICKETS_LIST)
         session.pagination_offset = 0
@@ -495,6 +522,9 @@ class TestPsychologistMyTicketsPagination:
         tickets = [_make_ticket(f"my-t{i}", f"Моя тема {i}", TicketStatus.IN_PROGRESS, assigned_to="psy_001")
                    for i in range(3)]
         env['ticket_repo'].get_all.return_value = tickets
+        env['ticket_repo'].get.side_effect = (
+            lambda tid: next((t for t in tickets if t.id == tid), None)
+        )
 
         session = UserSession(user_id="psy_001", state=State.PSY_MY_TICKETS)
         session.pagination_offset = 0
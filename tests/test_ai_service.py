@@ -1,8 +1,10 @@
 """
 Тесты для AI Service
 """
+import json
+
 import pytest
-from unittest.mock import Mock, AsyncMock, patch
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from application.ai_service import AIService, generate_ai_reply
 
 
@@ -44,7 +46,8 @@ class TestAIService:
         
         assert len(messages) == 1
         assert messages[0]["role"] == "system"
-        assert "психологической поддержки" in messages[0]["content"]
+        # Системный промпт — cache_control-блок со статичным текстом
+        assert "психологической поддержки" in messages[0]["content"][0]["text"]
     
     def test_build_messages_with_history(self, ai_service):
         """Позитивный: построение сообщений с историей"""
@@ -77,6 +80,38 @@ class TestAIService:
         assert messages[1]["content"] == "Message 2"  # Первое из последних 4
         assert messages[-1]["content"] == "Message 5"  # Последнее
     
+    def test_compact_history_merges_same_role_runs(self, ai_service):
+        """Позитивный: подряд идущие сообщения одной роли склеиваются"""
+        history = [
+            {"role": "user", "content": "A"},
+            {"role": "user", "content": "B"},
+            {"role": "assistant", "content": "C"},
+        ] + [
+            {"role": "user", "content": f"recent {i}"} for i in range(6)
+        ]
+
+        compacted = ai_service._compact_history(history)
+
+        # Старая часть: user A+B склеены, C отдельно; последние 6 нетронуты
+        assert compacted[0] == {"role": "user", "content": "A\nB"}
+        assert compacted[1] == {"role": "assistant", "content": "C"}
+        assert compacted[2:] == history[3:]
+
+    def test_compact_history_rolls_up_long_tail(self, ai_service):
+        """Граничный: слишком длинный хвост сворачивается в одну сводку"""
+        history = [
+            {"role": "user", "content": "x" * 3000},
+            {"role": "assistant", "content": "y" * 3000},
+        ] + [
+            {"role": "user", "content": f"recent {i}"} for i in range(6)
+        ]
+
+        compacted = ai_service._compact_history(history)
+
+        assert compacted[0]["role"] == "system"
+        assert "сводка ранней беседы" in compacted[0]["content"]
+        assert compacted[1:] == history[2:]
+
     @pytest.mark.asyncio
     async def test_generate_reply_no_api_key(self):
         """Негативный: генерация без API ключа"""
@@ -92,7 +127,7 @@ class TestAIService:
         import httpx
         
         with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            mock_client.return_value.post = AsyncMock(
                 side_effect=httpx.TimeoutException("Timeout")
             )
             
@@ -108,9 +143,9 @@ class TestAIService:
         with patch('httpx.AsyncClient') as mock_client:
             mock_response = Mock()
             mock_response.status_code = 429
-            mock_response.text = "Too many requests"
+            mock_response.content = b"Too many requests"
             
-            mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            mock_client.return_value.post = AsyncMock(
                 side_effect=httpx.HTTPStatusError(
                     "429", request=Mock(), response=mock_response
                 )
@@ -120,6 +155,36 @@ class TestAIService:
             
             assert "лимит запросов" in reply
     
+    @pytest.mark.asyncio
+    async def test_generate_reply_streaming_http_error_429(self, ai_service):
+        """Негативный: 429 в потоковом режиме отдаёт сообщение о лимите"""
+        import httpx
+
+        response = Mock()
+        response.status_code = 429
+        response.content = b"Too many requests"
+        response.aread = AsyncMock(return_value=b"Too many requests")
+
+        def _raise_for_status():
+            # Тело должно быть прочитано до raise_for_status, иначе
+            # обработчик ошибки упадёт на e.response.content
+            assert response.aread.await_count == 1
+            raise httpx.HTTPStatusError("429", request=Mock(), response=response)
+
+        response.raise_for_status = Mock(side_effect=_raise_for_status)
+
+        stream_cm = MagicMock()
+        stream_cm.__aenter__ = AsyncMock(return_value=response)
+        stream_cm.__aexit__ = AsyncMock(return_value=False)
+        client = Mock()
+        client.stream = Mock(return_value=stream_cm)
+
+        with patch.object(ai_service, '_get_client', return_value=client), \
+             patch('application.ai_service.AI_STREAMING', True):
+            reply = await ai_service.generate_reply("Test", [])
+
+        assert "лимит запросов" in reply
+
     @pytest.mark.asyncio
     async def test_generate_reply_success(self, ai_service):
         """Позитивный: успешная генерация ответа"""
@@ -137,10 +202,10 @@ class TestAIService:
         
         with patch('httpx.AsyncClient') as mock_client:
             mock_response = Mock()
-            mock_response.json.return_value = mock_response_data
+            mock_response.content = json.dumps(mock_response_data).encode()
             mock_response.raise_for_status = Mock()
             
-            mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            mock_client.return_value.post = AsyncMock(
                 return_value=mock_response
             )
             
@@ -165,10 +230,10 @@ class TestAIService:
         
         with patch('httpx.AsyncClient') as mock_client:
             mock_response = Mock()
-            mock_response.json.return_value = mock_response_data
+            mock_response.content = json.dumps(mock_response_data).encode()
             mock_response.raise_for_status = Mock()
             
-            mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            mock_client.return_value.post = AsyncMock(
                 return_value=mock_response
             )
             
@@ -281,10 +346,10 @@ class TestEdgeCases:
         
         with patch('httpx.AsyncClient') as mock_client:
             mock_response = Mock()
-            mock_response.json.return_value = mock_response_data
+            mock_response.content = json.dumps(mock_response_data).encode()
             mock_response.raise_for_status = Mock()
             
-            mock_client.return_value.__aenter__.return_value.post = AsyncMock(
+            mock_client.return_value.post = AsyncMock(
                 return_value=mock_response
             )
             
@@ -1,5 +1,5 @@
 import pytest
-from domain.models import State, Severity
+from domain.models import State, Severity, Ticket, TicketStatus
 from application.bot_service import BotService
 from application.state_machine import StateMachine
 from infrastructure.in_memory_repositories import (
@@ -263,3 +263,43 @@ def test_ticket_admin_operations(bot_service):
     updated_ticket = bot_service.get_ticket(ticket.id)
     assert len(updated_ticket.chat_history) == 1
     assert updated_ticket.chat_history[0]["message"] == "Здравствуйте, чем могу помочь?"
+
+
+def test_status_index_preserves_creation_order():
+    """Тест слияния корзин статусов в порядке создания заявок"""
+    repo = InMemoryTicketRepository()
+    for i in range(5):
+        repo.create(Ticket(
+            id=f"t{i}", user_id=f"u{i}", topic=f"Тема {i}", gender="M",
+            age=30, severity=Severity.LOW, message="Описание",
+            status=TicketStatus.NEW
+        ))
+
+    # update() переиндексирует t1 в конец корзины нового статуса —
+    # порядок выборки всё равно должен остаться порядком создания
+    t1 = repo.get("t1")
+    t1.status = TicketStatus.WAITING_RESPONSE
+    repo.update(t1)
+
+    result = repo.get_by_status_in({TicketStatus.NEW, TicketStatus.WAITING_RESPONSE})
+    assert [t.id for t in result] == ["t0", "t1", "t2", "t3", "t4"]
+
+
+def test_assignee_index_preserves_creation_order():
+    """Тест: 'мои заявки' остаются в порядке создания после update()"""
+    repo = InMemoryTicketRepository()
+    for i in range(4):
+        repo.create(Ticket(
+            id=f"t{i}", user_id=f"u{i}", topic=f"Тема {i}", gender="M",
+            age=30, severity=Severity.LOW, message="Описание",
+            status=TicketStatus.IN_PROGRESS, assigned_to="psy_1"
+        ))
+
+    # update() переиндексирует t1 в конец корзины психолога —
+    # порядок выборки всё равно должен остаться порядком создания
+    t1 = repo.get("t1")
+    t1.status = TicketStatus.WAITING_RESPONSE
+    repo.update(t1)
+
+    result = repo.get_by_assignee("psy_1")
+    assert [t.id for t in result] == ["t0", "t1", "t2", "t3"]
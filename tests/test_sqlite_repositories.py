@@ -0,0 +1,114 @@
+"""
+Тесты SQLite-репозитория заявок: страницы списков и ленивые представления
+"""
+import pytest
+from datetime import datetime
+from domain.models import Ticket, TicketStatus, Severity
+from infrastructure.sqlite_repositories import SQLiteTicketRepository, LazyTicket
+
+
+@pytest.fixture
+def ticket_repo(tmp_path):
+    """Репозиторий поверх временного файла БД с набором заявок"""
+    repo = SQLiteTicketRepository(str(tmp_path / "tickets.db"))
+
+    statuses = [
+        TicketStatus.NEW, TicketStatus.WAITING_RESPONSE,
+        TicketStatus.IN_PROGRESS, TicketStatus.CLOSED,
+    ]
+    tickets = []
+    for i in range(12):
+        tickets.append(Ticket(
+            id=f"ticket_{i:03d}",
+            user_id=f"user_{i}",
+            topic=f"Проблема {i}",
+            gender="M",
+            age=30,
+            severity=Severity.MEDIUM,
+            message=f"Описание {i}",
+            status=statuses[i % len(statuses)],
+            assigned_to="psy_001" if i % 4 == 2 else None,
+            created_at=datetime(2026, 1, 1 + i, 12, 0)
+        ))
+    repo.create_many(tickets)
+    return repo
+
+
+class TestListPage:
+    """Тесты постраничной выборки list_page"""
+
+    def test_status_filter_and_total(self, ticket_repo):
+        """Позитивный: фильтр по статусам и общее количество"""
+        page, total = ticket_repo.list_page(
+            0, 10, statuses={TicketStatus.NEW, TicketStatus.WAITING_RESPONSE}
+        )
+
+        assert total == 6
+        assert len(page) == 6
+        assert all(t.status in (TicketStatus.NEW, TicketStatus.WAITING_RESPONSE)
+                   for t in page)
+
+    def test_limit_offset(self, ticket_repo):
+        """Позитивный: LIMIT/OFFSET отдают страницы без пересечений"""
+        first, total = ticket_repo.list_page(0, 4, statuses=set(TicketStatus))
+        second, _ = ticket_repo.list_page(4, 4, statuses=set(TicketStatus))
+
+        assert total == 12
+        assert len(first) == 4 and len(second) == 4
+        assert not {t.id for t in first} & {t.id for t in second}
+
+    def test_ordering_oldest_first(self, ticket_repo):
+        """Позитивный: порядок от старых к новым, как у get_by_status_in"""
+        page, _ = ticket_repo.list_page(0, 10, statuses={TicketStatus.NEW})
+
+        dates = [t.created_at for t in page]
+        assert dates == sorted(dates)
+        assert [t.id for t in page] == [t.id for t in ticket_repo.get_by_status_in({TicketStatus.NEW})]
+
+    def test_assignee_filter(self, ticket_repo):
+        """Позитивный: фильтр по назначенному специалисту"""
+        page, total = ticket_repo.list_page(0, 10, assigned_to="psy_001")
+
+        assert total == 3
+        assert all(t.assigned_to == "psy_001" for t in page)
+
+    def test_offset_beyond_total(self, ticket_repo):
+        """Негативный: смещение за границей — пустая страница, total сохраняется"""
+        page, total = ticket_repo.list_page(100, 10, statuses={TicketStatus.NEW})
+
+        assert page == []
+        assert total == 3
+
+
+class TestLazyTicket:
+    """Тесты ленивого представления строки списка"""
+
+    def test_list_fields_available(self, ticket_repo):
+        """Позитивный: поля списка читаются и декодируются корректно"""
+        page, _ = ticket_repo.list_page(0, 1, statuses={TicketStatus.NEW})
+        view = page[0]
+
+        assert isinstance(view, LazyTicket)
+        assert view.id == "ticket_000"
+        assert view.user_id == "user_0"
+        assert view.severity is Severity.MEDIUM
+        assert view.status is TicketStatus.NEW
+        assert view.created_at == datetime(2026, 1, 1, 12, 0)
+        assert "Проблема 0" in view.display_line()
+
+    def test_projection_guard(self, ticket_repo):
+        """Негативный: тяжёлых столбцов (message, chat_history) у представления нет"""
+        page, _ = ticket_repo.list_page(0, 1, statuses={TicketStatus.NEW})
+
+        with pytest.raises(AttributeError):
+            page[0].message
+        with pytest.raises(AttributeError):
+            page[0].chat_history
+
+    def test_full_ticket_via_get(self, ticket_repo):
+        """Позитивный: полный объект для карточки берётся через get() по id"""
+        page, _ = ticket_repo.list_page(0, 1, statuses={TicketStatus.NEW})
+        ticket = ticket_repo.get(page[0].id)
+
+        assert isinstance(ticket, Ticket)
+        assert ticket.message == "Описание 0"
@@ -61,6 +61,17 @@ def setup_bot_with_tickets():
     
     ticket_repo.get_all.return_value = tickets
     ticket_repo.get = lambda ticket_id: next((t for t in tickets if t.id == ticket_id), None)
+    # Индексные выборки эмулируем поверх get_all, как реализации по умолчанию
+    ticket_repo.get_by_status_in.side_effect = (
+        lambda statuses: [t for t in ticket_repo.get_all() if t.status in set(statuses)]
+    )
+    def _count_active(statuses):
+        counts = {}
+        for t in ticket_repo.get_all():
+            if t.assigned_to is not None and t.status in set(statuses):
+                counts[t.assigned_to] = counts.get(t.assigned_to, 0) + 1
+        return counts
+    ticket_repo.count_active_by_assignee.side_effect = _count_active
     
     return {
         'bot_service': bot_service,
@@ -113,6 +124,36 @@ class TestTicketSorting:
         assert sorted_tickets == []
 
 
+class TestAssignmentQueueCache:
+    """Тесты кэша очереди назначения при листании страниц"""
+
+    def test_page_flip_does_not_refetch(self, setup_bot_with_tickets):
+        """Позитивный: повторная страница при той же версии заявок не ходит в репозиторий"""
+        env = setup_bot_with_tickets
+        bot_service = env['bot_service']
+        ticket_repo = env['ticket_repo']
+
+        first_page, total = bot_service.get_top_tickets_for_assignment(10)
+        second_page, total2 = bot_service.get_top_tickets_for_assignment(20)
+
+        assert ticket_repo.get_by_status_in.call_count == 1
+        assert total == total2
+        assert second_page[:len(first_page)] == first_page
+
+    def test_mutation_invalidates_cache(self, setup_bot_with_tickets):
+        """Позитивный: назначение заявки сбрасывает кэш, очередь перечитывается"""
+        env = setup_bot_with_tickets
+        bot_service = env['bot_service']
+        ticket_repo = env['ticket_repo']
+
+        bot_service.get_top_tickets_for_assignment(10)
+        assert bot_service.assign_ticket("ticket_001", "psy_001") is True
+        tickets, _ = bot_service.get_top_tickets_for_assignment(10)
+
+        assert ticket_repo.get_by_status_in.call_count == 2
+        assert all(t.id != "ticket_001" for t in tickets)
+
+
 class TestPsychologistSorting:
     """Тесты для сортировки психологов по нагрузке"""
     